@@ -1,13 +1,30 @@
 import os
+import sys
+import json
+import base64
+import asyncio
+import random
 import logging
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
 from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 from supabase import create_client, Client
-import requests
 from dotenv import load_dotenv
 from jose import jwt, JWTError
 from typing import List, Optional
 
+# Local modules live next to this file
+sys.path.append(os.path.dirname(__file__))
+from profiling import span, start_profile, finish_profile, save_profile, PROFILE_SAMPLE_RATE
+from projection import parse_fields, project_accounts
+from cache import cache
+from simplefin import get_connections, fetch_accounts_blocking, stream_accounts, all_failed, SYNC_COOLDOWN_MINUTES
+from sync_ledger import SyncRun
+
 load_dotenv(override=True)
 
 # Logging setup
@@ -28,18 +45,40 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 app = FastAPI()
 
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    # Opt-in: API-key callers send X-Profile: 1, everyone else is sampled.
+    # Only opted-in callers see the timings
+    requested = (
+        request.headers.get("x-profile") == "1"
+        and API_KEY
+        and request.headers.get("secret") == API_KEY
+    )
+    if not requested and not (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+        return await call_next(request)
+    token = start_profile(request.method, request.url.path)
+    try:
+        response = await call_next(request)
+    finally:
+        profile = finish_profile(token)
+        await save_profile(profile)
+    if requested:
+        response.headers["Server-Timing"] = profile.server_timing()
+    return response
+
 def get_table(table_name: str):
     # Use public_ottermoney schema explicitly
     return supabase.schema("public").table(table_name)
 
 def verify_jwt(token: str):
     try:
-        payload = jwt.decode(
-            token,
-            SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            audience="authenticated"  # <-- add this line
-        )
+        with span("auth"):
+            payload = jwt.decode(
+                token,
+                SUPABASE_JWT_SECRET,
+                algorithms=["HS256"],
+                audience="authenticated"  # <-- add this line
+            )
         #logging.info(f"Decoded JWT payload: {payload}")
         return payload.get("sub")  # sub is the user_id
     except JWTError as e:
@@ -49,6 +88,8 @@ def verify_jwt(token: str):
 @app.get("/api/v1/accounts")
 def get_accounts(
     user_id: str = Query(None),
+    fields: str = Query(None, description="Comma-separated account fields to return, e.g. id,name,balance,org.name"),
+    include_transactions: bool = Query(True),
     secret: str = Header(None),
     authorization: str = Header(None)
 ):
@@ -71,23 +112,28 @@ def get_accounts(
         logging.warning("Unauthorized access attempt: missing or invalid API key/JWT")
         raise HTTPException(status_code=401, detail="Missing or invalid API key or JWT")
 
+    # Reject a bad fields= before any SimpleFIN or database work
+    try:
+        parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     # Lookup user in Supabase
-    user_resp = get_table("om_user_simplefin_tokens").select("simplefin_token, user_id").eq("user_id", user_id).single().execute()
-    if not user_resp.data or not user_resp.data.get("simplefin_token"):
+    connections = get_connections(get_table, user_id)
+    if not connections:
         logging.error(f"User or token not found for user_id={user_id}")
         raise HTTPException(status_code=404, detail="User or token not found")
 
-    access_url = user_resp.data["simplefin_token"]
-    if not access_url.rstrip('/').endswith('/accounts'):
-        access_url = access_url.rstrip('/') + '/accounts'
-
     try:
-        resp = requests.get(access_url)
-        if resp.status_code != 200:
-            logging.error(f"SimpleFIN error for user_id={user_id}: {resp.status_code} {resp.text}")
-            return JSONResponse(status_code=resp.status_code, content={"error": resp.text})
+        merged = fetch_accounts_blocking(connections)
+        if all_failed(merged, connections):
+            first = merged["connection_errors"][0]
+            logging.error(f"SimpleFIN error for user_id={user_id}: {first['status']} {first['error']}")
+            return JSONResponse(status_code=first["status"] or 502, content={"error": first["error"]})
         logging.info(f"SimpleFIN success for user_id={user_id}")
-        return resp.json()
+        document = project_accounts(merged, fields, include_transactions)
+        with span("serialize"):
+            return JSONResponse(content=document)
     except Exception as e:
         logging.exception(f"Exception fetching SimpleFIN data for user_id={user_id}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -96,31 +142,226 @@ def upsert_user_accounts(user_id: str, accounts: List[dict], source: str = "simp
     # Prepare data for upsert
     upsert_data = []
     for acc in accounts:
-        upsert_data.append({
+        row = {
             "user_id": user_id,
             "sf_account_id": acc.get("id") or acc.get("sf_account_id"),
             "sf_account_name": acc.get("name") or acc.get("sf_account_name"),
             "sf_name": acc.get("org", {}).get("name") if acc.get("org") else acc.get("sf_name"),
             "balance": acc.get("balance") or acc.get("sf_balance") or acc.get("balance"),
             "sf_balance_date": acc.get("balance-date") or acc.get("sf_balance_date"),
-            "source": source,
-            "hidden": acc.get("hidden", False)
-        })
+            "source": source
+        }
+        # Manual accounts may set it; SimpleFIN never does, and writing the
+        # default would un-hide accounts the user hid on every refresh
+        if source != "simplefin-bridge":
+            row["hidden"] = acc.get("hidden", False)
+        upsert_data.append(row)
     # Upsert into user_accounts
     try:
-        resp = get_table("om_user_accounts").upsert(upsert_data, on_conflict="user_id,sf_account_id").execute()
+        with span("upsert.om_user_accounts"):
+            resp = get_table("om_user_accounts").upsert(upsert_data, on_conflict="user_id,sf_account_id").execute()
         logging.info(f"Successfully upserted accounts for user_id={user_id}")
+        cache.invalidate_user(user_id)
         return resp
     except Exception as e:
         logging.error(f"Error upserting om_user_accounts: {str(e)}")
         raise e
 
+# Stale-while-revalidate for /user_accounts: rows older than this (and than
+# the sync cooldown, see REFRESH_MIN_AGE_SECONDS) trigger a background
+# SimpleFIN refresh; a first-time user waits at most FIRST_LOAD_WAIT_SECONDS
+ACCOUNTS_STALE_AFTER_SECONDS = int(os.getenv("ACCOUNTS_STALE_AFTER_SECONDS", "3600"))
+FIRST_LOAD_WAIT_SECONDS = float(os.getenv("FIRST_LOAD_WAIT_SECONDS", "3"))
+# After a failed refresh, stale reads do not retry SimpleFIN for this long
+REFRESH_RETRY_SECONDS = int(os.getenv("REFRESH_RETRY_SECONDS", "300"))
+# Reads spend the same SimpleFIN quota as syncs, so they never refresh more
+# often than a user may sync
+REFRESH_MIN_AGE_SECONDS = max(ACCOUNTS_STALE_AFTER_SECONDS, SYNC_COOLDOWN_MINUTES * 60)
+
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="accounts-refresh")
+_refreshing = {}  # user_id -> Future of the refresh in flight
+_refresh_failed_at = {}  # user_id -> time.monotonic() of the last failed refresh
+_refreshing_lock = threading.Lock()
+
+def refresh_user_accounts(user_id: str) -> int:
+    """
+    Fetch the user's accounts from SimpleFIN and store them; returns the
+    number stored. Transactions are skipped while streaming, they are only
+    ingested by /api/v1/sync.
+
+    Does nothing when the accounts were refreshed or synced within the sync
+    cooldown, e.g. by another API process: returns 0 without calling SimpleFIN.
+    """
+    refreshed_at = accounts_refreshed_at(user_id)
+    if refreshed_at and (datetime.now(timezone.utc) - refreshed_at).total_seconds() < SYNC_COOLDOWN_MINUTES * 60:
+        logging.info(f"Skipping account refresh for user_id={user_id}: refreshed at {refreshed_at.isoformat()}")
+        return 0
+    run = SyncRun(user_id, trigger="refresh")
+    connections = get_connections(get_table, user_id)
+    accounts = []
+    connection_errors = []
+    if connections:
+        async def collect(event):
+            if event[0] == "account":
+                accounts.append(event[1])
+
+        started = time.perf_counter()
+        merged = asyncio.run(stream_accounts(connections, collect))
+        run.fetched(merged, time.perf_counter() - started, 0.0)
+        connection_errors = merged["connection_errors"]
+        if all_failed(merged, connections):
+            run.finish(get_table, "failed", connection_errors[0]["error_class"], connection_errors[0]["error"])
+            raise RuntimeError(connection_errors[0]["error"])
+        with run.db_write():
+            upsert_user_accounts(user_id, accounts, source="simplefin-bridge")
+    # Not sf_last_sync: a background refresh must not put the user's own sync on cooldown
+    now = datetime.now(timezone.utc).isoformat()
+    with run.db_write():
+        get_table("om_user_settings").upsert({
+            "id": user_id,
+            "sf_accounts_refreshed_at": now,
+            "updated_at": now
+        }).execute()
+    run.account_count = len(accounts)
+    if connection_errors:
+        run.finish(get_table, "partial", connection_errors[0]["error_class"], connection_errors[0]["error"])
+    else:
+        run.finish(get_table, "success")
+    logging.info(f"Refreshed {len(accounts)} accounts for user_id={user_id}")
+    return len(accounts)
+
+def schedule_account_refresh(user_id: str):
+    """
+    Start a background refresh for the user unless one is already running,
+    and return its Future. Returns None while backing off after a failure.
+    Deduplication is per API process.
+    """
+    with _refreshing_lock:
+        future = _refreshing.get(user_id)
+        if future is not None:
+            return future
+        failed_at = _refresh_failed_at.get(user_id)
+        if failed_at is not None and time.monotonic() - failed_at < REFRESH_RETRY_SECONDS:
+            return None
+        future = _refresh_executor.submit(refresh_user_accounts, user_id)
+        _refreshing[user_id] = future
+
+    def done(f):
+        with _refreshing_lock:
+            if _refreshing.get(user_id) is f:
+                del _refreshing[user_id]
+            if f.exception() is not None:
+                _refresh_failed_at[user_id] = time.monotonic()
+            else:
+                _refresh_failed_at.pop(user_id, None)
+        if f.exception() is not None:
+            logging.error(f"Background account refresh failed for user_id={user_id}: {f.exception()}")
+    future.add_done_callback(done)
+    return future
+
+def accounts_refreshed_at(user_id: str) -> Optional[datetime]:
+    # Last time the stored accounts came from SimpleFIN, by refresh or by sync
+    with span("db.om_user_settings.select"):
+        resp = get_table("om_user_settings").select("sf_accounts_refreshed_at, sf_last_sync").eq("id", user_id).execute()
+    if not resp.data:
+        return None
+    stamps = [
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+        for value in (resp.data[0].get("sf_accounts_refreshed_at"), resp.data[0].get("sf_last_sync"))
+        if value
+    ]
+    stamps = [stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc) for stamp in stamps]
+    return max(stamps) if stamps else None
+
+def with_logo_urls(accounts: List[dict]) -> List[dict]:
+    # Resolved through the in-memory logo index; no file access per request
+    if logo_index is None:
+        return accounts
+    for acc in accounts:
+        acc["logo_url"] = logo_index.logo_url(acc.get("sf_name"))
+        acc["logo_sprite"] = logo_index.logo_sprite(acc.get("sf_name"))
+    return accounts
+
+USER_ACCOUNT_COLUMNS = "sf_account_id, sf_account_name, sf_name, balance, sf_balance_date, category, display_name, source, hidden"
+
+# sort= value -> column; every one is backed by a (user_id, column, sf_account_id) index
+ACCOUNT_SORT_KEYS = {
+    "name": "sf_account_name",
+    "display_name": "display_name",
+    "institution": "sf_name",
+    "balance": "balance",
+    "balance_date": "sf_balance_date",
+    "category": "category",
+    "source": "source",
+}
+
+def _quote(value) -> str:
+    # PostgREST filter value, quoted so commas and parentheses are literal
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{value}"'
+
+def encode_cursor(row: dict, sort_column: str) -> str:
+    payload = json.dumps([row.get(sort_column), row["sf_account_id"]])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return value, last_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def build_user_accounts_query(user_id, show_hidden=False, sort_column="sf_account_name", descending=False,
+                              category=None, source=None, institution=None, search=None, cursor=None):
+    """
+    Filtered, sorted select on om_user_accounts with keyset pagination.
+
+    Rows are ordered by the sort column, then sf_account_id as a tie-breaker.
+    The cursor holds both values of the last row returned. Postgres puts
+    NULLs last when ascending and first when descending, and the seek
+    condition follows that.
+    """
+    query = get_table("om_user_accounts").select(USER_ACCOUNT_COLUMNS).eq("user_id", user_id)
+    if not show_hidden:
+        query = query.or_("hidden.is.null,hidden.eq.false")
+    if category:
+        query = query.eq("category", category)
+    if source:
+        query = query.eq("source", source)
+    if institution:
+        query = query.eq("sf_name", institution)
+    if search:
+        pattern = _quote(f"*{search}*")
+        query = query.or_(f"sf_account_name.ilike.{pattern},display_name.ilike.{pattern}")
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        col, after_id = sort_column, f"sf_account_id.gt.{_quote(last_id)}"
+        if value is None:
+            seek = f"and({col}.is.null,{after_id})"
+            if descending:
+                seek += f",{col}.not.is.null"
+        else:
+            op = "lt" if descending else "gt"
+            seek = f"{col}.{op}.{_quote(value)},and({col}.eq.{_quote(value)},{after_id})"
+            if not descending:
+                seek += f",{col}.is.null"
+        query = query.or_(seek)
+    return query.order(sort_column, desc=descending).order("sf_account_id")
+
 @app.get("/api/v1/user_accounts")
 def get_user_accounts(
     user_id: str = Query(None),
     secret: str = Header(None),
     authorization: str = Header(None),
-    show_hidden: bool = Query(False)
+    show_hidden: bool = Query(False),
+    sort: str = Query("name", pattern="^(" + "|".join(ACCOUNT_SORT_KEYS) + ")$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    category: str = Query(None),
+    source: str = Query(None),
+    institution: str = Query(None),
+    q: str = Query(None, description="Case-insensitive search on account and display name"),
+    limit: int = Query(None, ge=1, le=500),
+    cursor: str = Query(None)
 ):
     # Auth logic (reuse from get_accounts)
     # logging.info(f"Authorization header: {authorization}")
@@ -138,36 +379,177 @@ def get_user_accounts(
     else:
         raise HTTPException(status_code=401, detail="Missing or invalid API key or JWT")
 
-    # Always return all accounts from user_accounts, but filter hidden unless show_hidden is True
-    query = get_table("om_user_accounts").select("sf_account_id, sf_account_name, sf_name, balance, sf_balance_date, category, display_name, source, hidden").eq("user_id", user_id)
-    if not show_hidden:
-        query = query.or_("hidden.is.null,hidden.eq.false")
-    resp = query.execute()
-    if resp.data and len(resp.data) > 0:
-        return {"accounts": resp.data}
+    sort_column = ACCOUNT_SORT_KEYS[sort]
 
-    # If not cached, fetch from SimpleFIN and cache
-    user_resp = get_table("om_user_simplefin_tokens").select("simplefin_token, user_id").eq("user_id", user_id).single().execute()
-    if not user_resp.data or not user_resp.data.get("simplefin_token"):
+    def select_page():
+        query = build_user_accounts_query(
+            user_id, show_hidden, sort_column, order == "desc",
+            category=category, source=source, institution=institution, search=q, cursor=cursor
+        )
+        if limit:
+            # One extra row tells whether there is a next page
+            query = query.limit(limit + 1)
+        with span("db.om_user_accounts.select"):
+            rows = query.execute().data or []
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1], sort_column)
+        return rows, next_cursor
+
+    def respond(rows, next_cursor, refreshed_at, refreshing):
+        with span("serialize"):
+            return JSONResponse(content={
+                "accounts": with_logo_urls(rows),
+                "next_cursor": next_cursor,
+                "refreshed_at": refreshed_at.isoformat() if refreshed_at else None,
+                "refreshing": refreshing
+            })
+
+    # Stored rows are always served as they are; stale ones are refreshed in the background
+    rows, next_cursor = select_page()
+    refreshed_at = accounts_refreshed_at(user_id)
+    if rows or refreshed_at or any((category, source, institution, q, cursor)):
+        age = (datetime.now(timezone.utc) - refreshed_at).total_seconds() if refreshed_at else None
+        refreshing = False
+        if age is None or age > REFRESH_MIN_AGE_SECONDS:
+            refreshing = schedule_account_refresh(user_id) is not None
+        return respond(rows, next_cursor, refreshed_at, refreshing)
+
+    # First load (never refreshed, nothing stored): give SimpleFIN a moment, then answer with whatever is stored
+    connections = get_connections(get_table, user_id)
+    if not connections:
         raise HTTPException(status_code=404, detail="User or token not found")
-    access_url = user_resp.data["simplefin_token"]
-    if not access_url.rstrip('/').endswith('/accounts'):
-        access_url = access_url.rstrip('/') + '/accounts'
+    future = schedule_account_refresh(user_id)
+    if future is None:
+        return JSONResponse(status_code=502, content={"error": "SimpleFIN refresh failed recently, try again later"})
+    try:
+        with span("simplefin.first_load"):
+            future.result(timeout=FIRST_LOAD_WAIT_SECONDS)
+    except FutureTimeout:
+        return respond([], None, None, True)
+    except Exception as e:
+        return JSONResponse(status_code=502, content={"error": str(e)})
+    rows, next_cursor = select_page()
+    return respond(rows, next_cursor, accounts_refreshed_at(user_id), False)
+
+_bootstrap_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bootstrap")
+
+def run_concurrently(*calls):
+    """Run blocking calls on the bootstrap pool and return their results in order"""
+    # Each call gets its own context copy so profiling spans nest under the request
+    futures = [_bootstrap_executor.submit(contextvars.copy_context().run, call) for call in calls]
+    return [future.result() for future in futures]
+
+def _to_amount(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def summarize_accounts(accounts: List[dict]) -> dict:
+    """Net worth, assets, liabilities and per-category totals of the given accounts"""
+    assets = liabilities = 0.0
+    by_category = {}
+    for acc in accounts:
+        balance = _to_amount(acc.get("balance"))
+        if balance >= 0:
+            assets += balance
+        else:
+            liabilities += balance
+        category = acc.get("category") or "Uncategorized"
+        by_category[category] = by_category.get(category, 0.0) + balance
+    return {
+        "account_count": len(accounts),
+        "net_worth": round(assets + liabilities, 2),
+        "assets": round(assets, 2),
+        "liabilities": round(liabilities, 2),
+        "by_category": {name: round(total, 2) for name, total in sorted(by_category.items())},
+    }
+
+def _parse_stamp(value) -> Optional[datetime]:
+    if not value:
+        return None
+    stamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+@app.get("/api/v1/bootstrap")
+def get_bootstrap(
+    user_id: str = Query(None),
+    secret: str = Header(None),
+    authorization: str = Header(None)
+):
+    """
+    Everything the app needs at startup in one round trip: the verified
+    user, settings, visible accounts with summary totals, and sync state.
+    Built from concurrent database reads; SimpleFIN is never called while
+    the request waits. Stale accounts are refreshed in the background as
+    /user_accounts does, and sync.refreshing tells the client to revalidate.
+    """
+    if secret == API_KEY:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="user_id is required with API key")
+    elif authorization and authorization.startswith("Bearer "):
+        token = authorization.split(" ", 1)[1]
+        user_id_from_jwt = verify_jwt(token)
+        if not user_id_from_jwt:
+            raise HTTPException(status_code=401, detail="Invalid JWT token")
+        user_id = user_id_from_jwt
+    else:
+        raise HTTPException(status_code=401, detail="Missing or invalid API key or JWT")
+
+    def load_user_settings():
+        # The settings router's loader, so bootstrap shares its cache
+        return load_settings(user_id) if load_settings else None
+
+    def load_sync_state():
+        with span("db.om_user_settings.select"):
+            resp = get_table("om_user_settings").select("sf_last_sync, sf_accounts_refreshed_at").eq("id", user_id).execute()
+        return resp.data[0] if resp.data else {}
+
+    def load_accounts():
+        with span("db.om_user_accounts.select"):
+            return build_user_accounts_query(user_id).execute().data or []
+
+    def count_connections():
+        with span("token_lookup"):
+            return len(get_table("om_user_simplefin_tokens").select("id").eq("user_id", user_id).execute().data or [])
+
     try:
-        resp_sf = requests.get(access_url)
-        if resp_sf.status_code != 200:
-            return JSONResponse(status_code=resp_sf.status_code, content={"error": resp_sf.text})
-        accounts = resp_sf.json().get("accounts", [])
-        upsert_user_accounts(user_id, accounts, source="simplefin-bridge")
-        # Return the upserted data
-        query = get_table("om_user_accounts").select("sf_account_id, sf_account_name, sf_name, balance, sf_balance_date, category, display_name,source, hidden").eq("user_id", user_id)
-        if not show_hidden:
-            query = query.or_("hidden.is.null,hidden.eq.false")
-        resp = query.execute()
-        return {"accounts": resp.data}
+        settings, sync_state, accounts, connection_count = run_concurrently(
+            load_user_settings, load_sync_state, load_accounts, count_connections
+        )
     except Exception as e:
+        logging.error(f"Error loading bootstrap data for user_id={user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    now = datetime.now(timezone.utc)
+    last_sync = _parse_stamp(sync_state.get("sf_last_sync"))
+    refreshed = [stamp for stamp in (last_sync, _parse_stamp(sync_state.get("sf_accounts_refreshed_at"))) if stamp]
+    refreshed_at = max(refreshed) if refreshed else None
+    cooldown_remaining = 0
+    if last_sync:
+        cooldown_remaining = max(int(SYNC_COOLDOWN_MINUTES * 60 - (now - last_sync).total_seconds()), 0)
+    # Same staleness rule as /user_accounts
+    refreshing = False
+    if connection_count and (refreshed_at is None or (now - refreshed_at).total_seconds() > REFRESH_MIN_AGE_SECONDS):
+        refreshing = schedule_account_refresh(user_id) is not None
+
+    with span("serialize"):
+        return JSONResponse(content={
+            "user": {"id": user_id},
+            "settings": settings,
+            "accounts": with_logo_urls(accounts),
+            "summary": summarize_accounts(accounts),
+            "sync": {
+                "connections": connection_count,
+                "last_sync": last_sync.isoformat() if last_sync else None,
+                "refreshed_at": refreshed_at.isoformat() if refreshed_at else None,
+                "refreshing": refreshing,
+                "cooldown_remaining_seconds": cooldown_remaining,
+            },
+        })
+
 @app.post("/api/v1/user_accounts")
 def add_manual_account(
     account: dict,
@@ -214,10 +596,21 @@ def hide_account(
     # Only allow update for this user's account
     resp = get_table("om_user_accounts").update({"hidden": hidden}).eq("sf_account_id", account_id).eq("user_id", user_id).execute()
     if resp.data is not None:
+        cache.invalidate_user(user_id)
         return {"status": "success", "hidden": hidden}
     else:
         raise HTTPException(status_code=404, detail="Account not found or not updated")
 
+@app.get("/api/v1/cache/stats")
+def get_cache_stats(secret: str = Header(None)):
+    """
+    Cache statistics. Hits and misses are counted by the worker process that
+    answers this request, not across workers; API key only.
+    """
+    if not API_KEY or secret != API_KEY:
+        raise HTTPException(status_code=401, detail="Missing or invalid API key")
+    return cache.stats()
+
 # Import and include sync router
 try:
     import sys
@@ -229,6 +622,36 @@ try:
 except ImportError as e:
     logging.warning(f"Failed to load sync router: {e}")
 
+try:
+    from routers.analytics import router as analytics_router
+    app.include_router(analytics_router, prefix="/api/v1")
+    logging.info("Analytics router loaded successfully")
+except ImportError as e:
+    logging.warning(f"Failed to load analytics router: {e}")
+
+try:
+    from routers.export import router as export_router
+    app.include_router(export_router, prefix="/api/v1")
+    logging.info("Export router loaded successfully")
+except ImportError as e:
+    logging.warning(f"Failed to load export router: {e}")
+
+load_settings = None
+try:
+    from routers.settings import router as settings_router, load_settings
+    app.include_router(settings_router, prefix="/api/v1")
+    logging.info("Settings router loaded successfully")
+except ImportError as e:
+    logging.warning(f"Failed to load settings router: {e}")
+
+logo_index = None
+try:
+    from routers.logos import router as logos_router, logo_index
+    app.include_router(logos_router, prefix="/api/v1")
+    logging.info("Logos router loaded successfully")
+except ImportError as e:
+    logging.warning(f"Failed to load logos router: {e}")
+
 if __name__ == "__main__":
     import sys
     import threading
@@ -0,0 +1,295 @@
+"""
+Cache shared by the API routers.
+
+Values must be JSON-serializable. Keys are namespaced ("analytics",
+"settings", ...) and can carry tags; every per-user entry is tagged
+"user:<id>" so everything cached for a user can be dropped at once.
+
+Backends, chosen with CACHE_BACKEND:
+
+- memory: in-process LRU with TTL, bounded by entry count and total bytes.
+  Private to one worker process.
+- sqlite: a SQLite file every worker on the host opens, at
+  CACHE_SQLITE_PATH or else in /dev/shm (shared memory) when available.
+  Needs no extra service.
+- redis: a Redis (or compatible) server at CACHE_URL, shared by any number
+  of processes and hosts. Requires the redis package and Redis 7 or later.
+
+Hit and miss counters are kept per process whatever the backend.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+# Redis is optional; only needed for CACHE_BACKEND=redis
+try:
+    import redis
+except ImportError:
+    redis = None
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH")
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+class MemoryBackend:
+    """LRU with per-entry TTL and size-bounded eviction"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (expires_at, payload, tags)
+        self.tags = {}                # tag -> set of keys
+        self.size = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def _remove(self, key):
+        _, payload, tags = self.entries.pop(key)
+        self.size -= len(payload)
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, payload: str, ttl: float, tags: Iterable[str]):
+        tags = tuple(tags)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + ttl, payload, tags)
+            self.size += len(payload)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        with self.lock:
+            keys = list(self.tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def backend_stats(self) -> dict:
+        return {"entries": len(self.entries), "bytes": self.size, "evictions": self.evictions}
+
+# A hit refreshes an entry's LRU position at most this often, so reads do
+# not each take the database write lock
+SQLITE_TOUCH_SECONDS = 60
+
+class SqliteBackend:
+    """Cache in a SQLite file shared by all worker processes on one host"""
+
+    def __init__(self, path: Optional[str] = CACHE_SQLITE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        shm = "/dev/shm"
+        directory = shm if os.path.isdir(shm) else tempfile.gettempdir()
+        self.path = path or os.path.join(directory, "ottermoney_cache.sqlite")
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, payload TEXT, expires_at REAL, used_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tags (tag TEXT, key TEXT, PRIMARY KEY (tag, key))")
+            conn.execute("CREATE INDEX IF NOT EXISTS tags_key ON tags (key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)")
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT payload, expires_at, used_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            self.delete(key)
+            return None
+        if now - row[2] >= SQLITE_TOUCH_SECONDS:
+            conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, payload: str, ttl: float, tags: Iterable[str]):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM tags WHERE key = ?", (key,))
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, payload, now + ttl, now))
+            conn.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)", [(tag, key) for tag in tags])
+            # Expired entries go first, then least recently used over the bound
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+            cursor = conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            if cursor.rowcount > 0:
+                self.evictions += cursor.rowcount
+                conn.execute("DELETE FROM tags WHERE key NOT IN (SELECT key FROM entries)")
+
+    def delete(self, key: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.execute("DELETE FROM tags WHERE key = ?", (key,))
+
+    def invalidate_tag(self, tag: str) -> int:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute("DELETE FROM entries WHERE key IN (SELECT key FROM tags WHERE tag = ?)", (tag,))
+            conn.execute("DELETE FROM tags WHERE key IN (SELECT key FROM tags WHERE tag = ?)", (tag,))
+            return cursor.rowcount
+
+    def backend_stats(self) -> dict:
+        count = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": count, "evictions": self.evictions, "path": self.path}
+
+class RedisBackend:
+    """Cache on a Redis-compatible server; eviction is left to its maxmemory policy"""
+
+    def __init__(self, url: Optional[str] = CACHE_URL):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        self.client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, payload: str, ttl: float, tags: Iterable[str]):
+        pipe = self.client.pipeline()
+        pipe.set(key, payload, px=int(ttl * 1000))
+        for tag in tags:
+            pipe.sadd(f"tag:{tag}", key)
+            # A tag set lives as long as its longest-lived entry: set the TTL
+            # on a new set, then only ever extend it (GT needs Redis 7)
+            pipe.expire(f"tag:{tag}", int(ttl) + 1, nx=True)
+            pipe.expire(f"tag:{tag}", int(ttl) + 1, gt=True)
+        pipe.execute()
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        keys = self.client.smembers(f"tag:{tag}")
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(f"tag:{tag}")
+        return len(keys)
+
+    def backend_stats(self) -> dict:
+        info = self.client.info("stats")
+        return {
+            "entries": self.client.dbsize(),
+            "evictions": info.get("evicted_keys", 0),
+            # Server-wide, across every process and key, tag sets included
+            "server_hits": info.get("keyspace_hits", 0),
+            "server_misses": info.get("keyspace_misses", 0),
+        }
+
+class Cache:
+    """Namespaced, tag-aware cache over one backend, with hit/miss counters"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(namespace: str, *parts) -> str:
+        return ":".join([namespace] + [str(part) for part in parts])
+
+    def get(self, namespace: str, *parts) -> Any:
+        try:
+            payload = self.backend.get(self.key(namespace, *parts))
+        except Exception as e:
+            # A broken cache must never fail the request
+            logging.warning(f"Cache get failed for {namespace}: {str(e)}")
+            payload = None
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(payload)
+
+    def set(self, namespace: str, *parts, value: Any, ttl: float = CACHE_DEFAULT_TTL, user_id: Optional[str] = None, tags: Iterable[str] = ()):
+        tags = list(tags)
+        if user_id:
+            tags.append(f"user:{user_id}")
+        try:
+            self.backend.set(self.key(namespace, *parts), json.dumps(value, default=str), ttl, tags)
+        except Exception as e:
+            logging.warning(f"Cache set failed for {namespace}: {str(e)}")
+
+    def delete(self, namespace: str, *parts):
+        try:
+            self.backend.delete(self.key(namespace, *parts))
+        except Exception as e:
+            logging.warning(f"Cache delete failed for {namespace}: {str(e)}")
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop everything cached for a user"""
+        try:
+            return self.backend.invalidate_tag(f"user:{user_id}")
+        except Exception as e:
+            logging.warning(f"Cache invalidation failed for user_id={user_id}: {str(e)}")
+            return 0
+
+    def stats(self) -> dict:
+        """Hit and miss counts are this process's own; entries and evictions are the backend's"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "counters": "process",
+            "pid": os.getpid(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            **self.backend.backend_stats(),
+        }
+
+def create_cache(backend: str = CACHE_BACKEND) -> Cache:
+    if backend == "redis":
+        return Cache(RedisBackend())
+    if backend == "sqlite":
+        return Cache(SqliteBackend())
+    return Cache(MemoryBackend())
+
+cache = create_cache()
@@ -0,0 +1,301 @@
+"""
+Rule-based transaction categorization.
+
+Rules live on the user's transaction categories in om_user_settings.categories:
+
+    {"name": "Coffee", "color": "orange.400", "rules": [
+        {"match": "payee", "pattern": "starbucks"},
+        {"match": "regex", "pattern": "^SQ \\*.*COFFEE"},
+        {"match": "amount", "min": -5, "max": 0, "account_id": "ACT-123"}
+    ], "subcategories": [...]}
+
+Every rule may also carry "min"/"max" amount bounds and an "account_id".
+Rules scoped to the transaction's account win over global rules; otherwise
+the first matching rule in category order wins.
+"""
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+class CompiledRules:
+    """
+    A user's rules compiled into a single matcher.
+
+    All payee substrings are folded into one alternation scanned once per
+    description, instead of testing every pattern separately. Text matching
+    results are memoized per description within a batch, since payees
+    repeat heavily. Regex rules are still searched one by one, so they
+    dominate the cost on unique descriptions; scripts/bench_categorization.py
+    measures both cases.
+    """
+
+    def __init__(self, rules: List[dict]):
+        # Per-account rules are checked before global ones, each in user order
+        self.rules = sorted(rules, key=lambda r: (r.get("account_id") is None, r["priority"]))
+        self.payee_rules = [r for r in self.rules if r["match"] == "payee"]
+        self.regex_rules = [r for r in self.rules if r["match"] == "regex"]
+        self.amount_rules = [r for r in self.rules if r["match"] == "amount"]
+        self.rank = {r["priority"]: i for i, r in enumerate(self.rules)}
+        self.payee_priorities = {}
+        for r in self.payee_rules:
+            self.payee_priorities.setdefault(r["pattern"], set()).add(r["priority"])
+        # The zero-width lookahead lets matches overlap, so every position
+        # reports its longest matching pattern
+        patterns = list(self.payee_priorities)
+        self.payee_matcher = re.compile("(?=(%s))" % _trie_pattern(patterns)) if patterns else None
+        self._contained = {}
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def _patterns_within(self, hit: str) -> set:
+        """Rule ids of every payee pattern contained in a matched substring"""
+        priorities = self._contained.get(hit)
+        if priorities is None:
+            priorities = set()
+            for pattern, ids in self.payee_priorities.items():
+                if pattern in hit:
+                    priorities |= ids
+            self._contained[hit] = priorities
+        return priorities
+
+    def _candidates(self, text: str) -> List[dict]:
+        """Rules that may apply to a lowercased description, in evaluation order"""
+        matched = set()
+        if self.payee_matcher:
+            for hit in set(self.payee_matcher.findall(text)):
+                matched |= self._patterns_within(hit)
+        for r in self.regex_rules:
+            if r["regex"].search(text):
+                matched.add(r["priority"])
+        candidates = [self.rules[self.rank[p]] for p in matched] + self.amount_rules
+        candidates.sort(key=lambda r: self.rank[r["priority"]])
+        return candidates
+
+    def categorize(self, transactions: Iterable[dict]) -> List[Optional[str]]:
+        """Return the category name for each transaction, or None"""
+        candidate_cache = {}
+        results = []
+        for tx in transactions:
+            text = " ".join(filter(None, (tx.get("payee"), tx.get("description")))).lower()
+            candidates = candidate_cache.get(text)
+            if candidates is None:
+                candidates = candidate_cache[text] = self._candidates(text)
+            category = None
+            if candidates:
+                amount = _to_float(tx.get("amount"))
+                account_id = tx.get("sf_account_id")
+                for r in candidates:
+                    if r["account_id"] is not None and r["account_id"] != account_id:
+                        continue
+                    if r["min"] is not None and (amount is None or amount < r["min"]):
+                        continue
+                    if r["max"] is not None and (amount is None or amount > r["max"]):
+                        continue
+                    category = r["category"]
+                    break
+            results.append(category)
+        return results
+
+def _trie_pattern(patterns: List[str]) -> str:
+    """
+    Build a regex matching any of the literal patterns, with common prefixes
+    factored into a trie so the engine does not retry every alternative at
+    every position. Longer continuations are tried first.
+    """
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        ends = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:%s)" % "|".join(branches)
+        if ends:
+            return "(?:%s)?" % body
+        return body
+
+    return build(trie)
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _collect_rules(categories: List[dict], rules: List[dict]):
+    for category in categories or []:
+        for rule in category.get("rules") or []:
+            match = rule.get("match")
+            pattern = rule.get("pattern")
+            compiled = {
+                "category": category.get("name"),
+                "match": match,
+                "priority": len(rules),
+                "account_id": rule.get("account_id"),
+                "min": _to_float(rule.get("min")),
+                "max": _to_float(rule.get("max")),
+            }
+            if match == "payee" and pattern:
+                compiled["pattern"] = pattern.lower()
+            elif match == "regex" and pattern:
+                try:
+                    compiled["regex"] = re.compile(pattern, re.IGNORECASE)
+                except re.error as e:
+                    logging.warning(f"Skipping invalid categorization regex {pattern!r}: {e}")
+                    continue
+            elif match != "amount":
+                continue
+            rules.append(compiled)
+        _collect_rules(category.get("subcategories"), rules)
+
+@lru_cache(maxsize=256)
+def _compile(categories_json: str) -> CompiledRules:
+    categories = json.loads(categories_json)
+    rules = []
+    _collect_rules(categories.get("transaction_categories"), rules)
+    return CompiledRules(rules)
+
+def compile_rules(categories) -> CompiledRules:
+    """
+    Compile a user's categories into a CompiledRules matcher.
+
+    Compiled rule sets are cached by the canonical JSON of the categories,
+    so a user's rules are compiled once and recompiled only after they change.
+    """
+    if isinstance(categories, list):
+        # Legacy shape: a bare list of account categories
+        categories = {"account_categories": categories, "transaction_categories": []}
+    if not isinstance(categories, dict):
+        categories = {}
+    return _compile(json.dumps(categories, sort_keys=True))
+
+CATEGORY_LISTS = ("account_categories", "transaction_categories")
+DEFAULT_CATEGORY_COLOR = "gray.500"
+RULE_MATCHES = ("payee", "regex", "amount")
+
+# Categories of users who never saved any
+DEFAULT_CATEGORIES = {
+    "account_categories": [
+        {"name": "Checking", "color": "green.500"},
+        {"name": "Savings", "color": "blue.500"},
+        {"name": "Investment", "color": "purple.500"},
+        {"name": "Credit Card", "color": "red.500"},
+    ],
+    "transaction_categories": [
+        {"name": "Food", "color": "green.500"},
+        {"name": "Bills", "color": "red.500"},
+        {"name": "Transportation", "color": "blue.500"},
+        {"name": "Entertainment", "color": "purple.500"},
+    ],
+}
+
+def _invalid(path: str, message: str, strict: bool, dropped: Optional[list], entry=None):
+    # Raise in strict mode; otherwise record what is left out, if asked to
+    if strict:
+        raise ValueError(f"{path}: {message}")
+    if dropped is not None:
+        dropped.append({"path": path, "reason": message, "entry": entry})
+
+def _normalize_rule(rule, path: str, strict: bool, dropped: Optional[list]) -> Optional[dict]:
+    if not isinstance(rule, dict) or rule.get("match") not in RULE_MATCHES:
+        _invalid(path, f"match must be one of {', '.join(RULE_MATCHES)}", strict, dropped, rule)
+        return None
+    # Fields this module does not know about are kept as they are
+    normalized = dict(rule)
+    if rule["match"] in ("payee", "regex"):
+        pattern = rule.get("pattern")
+        if not isinstance(pattern, str) or not pattern.strip():
+            _invalid(path, "pattern is required", strict, dropped, rule)
+            return None
+        normalized["pattern"] = pattern.strip()
+        if rule["match"] == "regex":
+            try:
+                re.compile(normalized["pattern"])
+            except re.error as e:
+                _invalid(path, f"invalid regex: {e}", strict, dropped, rule)
+                return None
+    for bound in ("min", "max"):
+        normalized.pop(bound, None)
+        if rule.get(bound) is not None:
+            value = _to_float(rule[bound])
+            if value is None:
+                _invalid(f"{path}.{bound}", "must be a number", strict, dropped, rule[bound])
+                continue
+            normalized[bound] = value
+    normalized.pop("account_id", None)
+    if rule.get("account_id"):
+        normalized["account_id"] = str(rule["account_id"])
+    return normalized
+
+def _normalize_list(categories, path: str, strict: bool, dropped: Optional[list]) -> List[dict]:
+    if categories is None:
+        return []
+    if not isinstance(categories, list):
+        _invalid(path, "must be a list", strict, dropped, categories)
+        return []
+    normalized, seen = [], set()
+    for i, category in enumerate(categories):
+        where = f"{path}[{i}]"
+        name = category.get("name") if isinstance(category, dict) else None
+        name = name.strip() if isinstance(name, str) else ""
+        if not name or name in seen:
+            _invalid(where, "name is required" if not name else f"duplicate name {name!r}", strict, dropped, category)
+            continue
+        seen.add(name)
+        color = category.get("color")
+        # Fields this module does not know about are kept as they are
+        entry = {key: value for key, value in category.items() if key not in ("subcategories", "rules")}
+        entry["name"] = name
+        entry["color"] = color.strip() if isinstance(color, str) and color.strip() else DEFAULT_CATEGORY_COLOR
+        subcategories = _normalize_list(category.get("subcategories"), f"{where}.subcategories", strict, dropped)
+        if subcategories:
+            entry["subcategories"] = subcategories
+        rules = category.get("rules")
+        if rules is not None and not isinstance(rules, list):
+            _invalid(f"{where}.rules", "must be a list", strict, dropped, rules)
+            rules = None
+        rules = [
+            rule for j, raw in enumerate(rules or [])
+            if (rule := _normalize_rule(raw, f"{where}.rules[{j}]", strict, dropped)) is not None
+        ]
+        if rules:
+            entry["rules"] = rules
+        normalized.append(entry)
+    return normalized
+
+def normalize_categories(categories, strict: bool = True, dropped: Optional[list] = None) -> dict:
+    """
+    Bring a categories document into the canonical shape
+
+        {"account_categories": [...], "transaction_categories": [...]}
+
+    accepting the legacy bare list of account categories; None gives
+    DEFAULT_CATEGORIES. Names are trimmed and must be unique within their
+    list, colors default to DEFAULT_CATEGORY_COLOR and rules are checked as
+    compile_rules reads them. Other fields of categories and rules are kept.
+
+    With strict, the first problem raises ValueError naming its path.
+    Otherwise, for documents already stored, invalid entries are left out
+    and, when `dropped` is a list, appended to it as {"path", "reason",
+    "entry"}, so callers can report them instead of losing them silently.
+    """
+    if categories is None:
+        categories = DEFAULT_CATEGORIES
+    if isinstance(categories, list):
+        categories = {"account_categories": categories}
+    if not isinstance(categories, dict):
+        _invalid("categories", "must be an object", strict, dropped, categories)
+        categories = {}
+    if strict:
+        unknown = set(categories) - set(CATEGORY_LISTS)
+        if unknown:
+            raise ValueError(f"categories: unknown keys {', '.join(sorted(unknown))}")
+    return {key: _normalize_list(categories.get(key), key, strict, dropped) for key in CATEGORY_LISTS}
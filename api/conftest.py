@@ -0,0 +1,5 @@
+# The API imports its local modules flat (see api.py), so tests do too
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
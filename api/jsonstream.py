@@ -0,0 +1,97 @@
+"""
+Incremental JSON parsing over text that arrives in chunks.
+
+A parser is a generator built from JsonStream's primitives with `yield from`.
+It yields NEED_INPUT when it has to read more (send it the next chunk, or
+'' at the end of the input) and otherwise yields its own events. Only the
+value being decoded and the unconsumed part of the current chunk are held.
+
+iter_events drives a parser over a blocking read function; async callers
+drive it themselves with advance().
+"""
+import json
+
+NEED_INPUT = object()
+
+# Characters that can follow a complete number, true, false or null
+_DELIMITERS = frozenset(' \t\n\r,:]}')
+
+class JsonStream:
+    """Buffer and tokenizer shared by the generator-based parsers"""
+
+    def __init__(self, name: str = "JSON"):
+        self.name = name
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        # Drop consumed input and append the next chunk; False at EOF
+        if self.eof:
+            return False
+        chunk = yield NEED_INPUT
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def next_token(self):
+        # Skip whitespace and return the next significant character, None at EOF
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not (yield from self.fill()):
+                return None
+
+    def decode_value(self):
+        # Decode one complete JSON value, reading more input as needed
+        yield from self.next_token()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # Strings and containers end with their closing character. A
+                # scalar at the end of the buffer may continue in the next
+                # chunk ("12." then "5"), so it is complete only once the
+                # character after it has been read, or at EOF
+                if self.buf[self.pos] in '"[{' or self.eof or (end < len(self.buf) and self.buf[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            yield from self.fill()
+
+    def expect(self, chars: str):
+        token = yield from self.next_token()
+        if token is None or token not in chars:
+            raise ValueError(f"Malformed {self.name}: expected {chars!r}, got {token!r}")
+        self.pos += 1
+        return token
+
+    def empty(self, closing: str):
+        # Consume `closing` if the container just opened is empty
+        if (yield from self.next_token()) == closing:
+            self.pos += 1
+            return True
+        return False
+
+def advance(parser, value=None):
+    """Next output of a parser, None once it has finished"""
+    try:
+        return parser.send(value)
+    except StopIteration:
+        return None
+
+def iter_events(parser, read):
+    """Run a parser over read(), which returns the next chunk or '' at the end"""
+    event = advance(parser)
+    while event is not None:
+        if event is NEED_INPUT:
+            event = advance(parser, read())
+            continue
+        yield event
+        event = advance(parser)
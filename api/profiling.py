@@ -0,0 +1,191 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when an API-key caller sends `X-Profile: 1`, or when
+it is picked by PROFILE_SAMPLE_RATE. Code marks interesting work with
+`span("name")`; spans nest into a tree that is returned in the
+`Server-Timing` response header to callers that asked for it. While a
+profiled request runs, a sampling profiler records the stacks of the threads
+that executed its spans, and the slowest requests get their span tree and
+folded stacks saved under logs/profiles/ (folded stacks load directly into
+flamegraph tools).
+
+Stacks are sampled per thread, not per request. The event loop thread and
+the worker threads also run other requests concurrently, so the folded
+stacks of a profile can include their frames; the span tree cannot.
+
+When a request is not profiled, `span()` is a single context-variable lookup.
+"""
+import asyncio
+import heapq
+import json
+import os
+import re
+import sys
+import threading
+import time
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "logs/profiles")
+# Number of slowest profiled requests whose dumps are kept on disk
+PROFILE_KEEP_SLOWEST = int(os.getenv("PROFILE_KEEP_SLOWEST", "20"))
+SAMPLE_INTERVAL = 0.005
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+# Innermost open span; a context variable so spans opened in worker threads
+# or concurrent tasks attach to the span that was open when they started
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+class Span:
+    __slots__ = ("name", "start", "duration", "children")
+
+    def __init__(self, name: str, start: float):
+        self.name = name
+        self.start = start
+        self.duration = None
+        self.children = []
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((self.duration or 0) * 1000, 3),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+class StackSampler(threading.Thread):
+    """Periodically sample the stacks of the threads a request runs on"""
+
+    def __init__(self, thread_ids: set):
+        super().__init__(daemon=True)
+        self.thread_ids = thread_ids
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or thread_id not in self.thread_ids:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.root = Span("request", time.perf_counter())
+        self.thread_ids = {threading.get_ident()}
+        self.sampler = StackSampler(self.thread_ids)
+
+    def start(self):
+        self.sampler.start()
+
+    def finish(self):
+        self.root.duration = time.perf_counter() - self.root.start
+        self.sampler.stop()
+
+    def server_timing(self) -> str:
+        """Flatten the span tree into a Server-Timing header value"""
+        entries = []
+
+        def walk(span, prefix):
+            for i, child in enumerate(span.children):
+                name = f"{prefix}{i}-{re.sub(r'[^A-Za-z0-9_.-]', '_', child.name)}"
+                entries.append(f'{name};dur={(child.duration or 0) * 1000:.2f};desc="{child.name}"')
+                walk(child, f"{prefix}{i}.")
+
+        walk(self.root, "")
+        entries.append(f"total;dur={self.root.duration * 1000:.2f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "spans": self.root.to_dict(self.root.start)["children"],
+            "stack_samples": "per thread; may include frames of other requests running concurrently on the same threads",
+        }
+
+@contextmanager
+def span(name: str):
+    """Time a block as a child of the current span; no-op unless profiling"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile.thread_ids.add(threading.get_ident())
+    parent = _current_span.get() or profile.root
+    current = Span(name, time.perf_counter())
+    parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current_span.reset(token)
+
+def start_profile(method: str, path: str):
+    """Begin profiling the current request; returns a token for finish_profile"""
+    profile = RequestProfile(method, path)
+    profile.start()
+    return profile, _current.set(profile)
+
+class SlowestProfiles:
+    """Keep dumps for the slowest PROFILE_KEEP_SLOWEST profiled requests"""
+
+    def __init__(self, keep: int = PROFILE_KEEP_SLOWEST, directory: str = PROFILE_DIR):
+        self.keep = keep
+        self.directory = directory
+        self.heap = []  # (duration, path prefix of dump files)
+        self.lock = threading.Lock()
+
+    def offer(self, profile: RequestProfile):
+        duration = profile.root.duration
+        with self.lock:
+            if len(self.heap) >= self.keep and duration <= self.heap[0][0]:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", profile.path).strip("_") or "root"
+            prefix = os.path.join(self.directory, f"{time.strftime('%Y%m%d_%H%M%S')}_{int(duration * 1000)}ms_{slug}")
+            with open(f"{prefix}.json", "w") as f:
+                json.dump(profile.to_dict(), f, indent=2)
+            with open(f"{prefix}.folded", "w") as f:
+                for stack, count in profile.sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            heapq.heappush(self.heap, (duration, prefix))
+            if len(self.heap) > self.keep:
+                _, evicted = heapq.heappop(self.heap)
+                for ext in (".json", ".folded"):
+                    try:
+                        os.remove(evicted + ext)
+                    except OSError:
+                        pass
+        logging.info(f"Saved profile for {profile.method} {profile.path} ({duration * 1000:.1f}ms) to {prefix}.json")
+
+slowest_profiles = SlowestProfiles()
+
+def finish_profile(token) -> RequestProfile:
+    profile, context_token = token
+    profile.finish()
+    _current.reset(context_token)
+    return profile
+
+async def save_profile(profile: RequestProfile):
+    """Offer a finished profile to slowest_profiles without blocking the event loop"""
+    await asyncio.to_thread(slowest_profiles.offer, profile)
@@ -0,0 +1,62 @@
+"""
+Server-side projection of SimpleFIN account set documents.
+
+`fields` is a comma-separated list of account fields, with dotted paths for
+nested values, e.g. "id,name,balance,balance-date,org.name". Top-level keys
+other than "accounts" (such as "errors") are always kept.
+"""
+from typing import Optional
+
+def parse_fields(fields: Optional[str]):
+    """
+    Split a fields= value into path tuples, or None for all fields.
+
+    Empty segments and paths are dropped ("id,,org..name" is "id,org.name");
+    raises ValueError when nothing is left, so callers can reject the request
+    before doing any work.
+    """
+    if not fields:
+        return None
+    paths = []
+    for field in fields.split(","):
+        path = tuple(part for part in field.strip().split(".") if part)
+        if path:
+            paths.append(path)
+    if not paths:
+        raise ValueError(f"fields={fields!r} names no fields")
+    return paths
+
+def _project(obj: dict, paths: list) -> dict:
+    out = {}
+    for path in paths:
+        value = obj
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            # Rebuild only the nested containers on the requested path
+            target = out
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+    return out
+
+def project_accounts(document: dict, fields: Optional[str] = None, include_transactions: bool = True) -> dict:
+    """Apply fields= projection and the compact (no transactions) mode"""
+    paths = parse_fields(fields)
+    if paths is None and include_transactions:
+        return document
+    if paths is not None and not include_transactions:
+        paths = [path for path in paths if path[0] != "transactions"]
+
+    accounts = []
+    for account in document.get("accounts", []):
+        if paths is not None:
+            accounts.append(_project(account, paths))
+        else:
+            accounts.append({key: value for key, value in account.items() if key != "transactions"})
+
+    projected = {key: value for key, value in document.items() if key != "accounts"}
+    projected["accounts"] = accounts
+    return projected
@@ -0,0 +1,195 @@
+from fastapi import APIRouter, HTTPException, Query, Header
+import numpy as np
+import os
+import logging
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from jose import jwt, JWTError
+from cache import cache
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+    responses={404: {"description": "Not found"}},
+)
+
+load_dotenv()
+
+# Initialize Supabase client
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+API_KEY = os.getenv("API_KEY")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# PostgREST max rows per response
+PAGE_SIZE = 1000
+
+UNCATEGORIZED = "Uncategorized"
+
+ANALYTICS_CACHE_TTL = 24 * 60 * 60
+
+def get_table(table_name: str):
+    # Use public schema explicitly
+    return supabase.schema("public").table(table_name)
+
+def verify_jwt(token: str):
+    try:
+        payload = jwt.decode(
+            token,
+            SUPABASE_JWT_SECRET,
+            algorithms=["HS256"],
+            audience="authenticated"
+        )
+        return payload.get("sub")  # sub is the user_id
+    except JWTError as e:
+        logging.warning(f"JWT verification failed: {str(e)}")
+        return None
+
+def load_transaction_columns(user_id: str):
+    """
+    Page through a user's posted transactions and return them as columnar
+    arrays: posted (epoch seconds), amount and category. Pending
+    transactions (posted = 0) are left out until they post.
+
+    Pages are read with keyset pagination on id, as in export.iter_pages;
+    the arrays are not in date order.
+    """
+    posted, amounts, categories = [], [], []
+    last_id = None
+    while True:
+        query = (
+            get_table("om_user_transactions")
+            .select("id, posted, amount, category, auto_category")
+            .eq("user_id", user_id)
+            .gt("posted", 0)
+            # Transfers between own accounts and re-delivered copies are not spend
+            .or_("is_transfer.is.null,is_transfer.eq.false")
+            .is_("duplicate_of", "null")
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(PAGE_SIZE).execute().data or []
+        # PostgREST may cap a page below PAGE_SIZE, so only an empty page ends the scan
+        if not page:
+            break
+        last_id = page[-1]["id"]
+        for row in page:
+            posted.append(row["posted"])
+            amounts.append(row.get("amount") or 0)
+            categories.append(row.get("category") or row.get("auto_category") or UNCATEGORIZED)
+    return (
+        np.asarray(posted, dtype=np.int64),
+        np.asarray(amounts, dtype=np.float64),
+        np.asarray(categories, dtype=object),
+    )
+
+def compute_analytics(posted, amounts, categories, months=None, rolling_window=3):
+    """
+    Spend by category and by month, month-over-month deltas and rolling
+    averages, all computed with whole-array operations.
+
+    Spending is the negated sum of outflows (negative amounts); income is
+    reported separately per month.
+    """
+    # Pending transactions carry posted = 0 and have no month yet
+    keep = posted > 0
+    posted, amounts, categories = posted[keep], amounts[keep], categories[keep]
+    if posted.size == 0:
+        return {"by_category": [], "by_month": [], "total_spend": 0.0, "total_income": 0.0}
+
+    month_index = posted.astype("datetime64[s]").astype("datetime64[M]")
+    if months:
+        first_month = month_index.max() - np.timedelta64(months - 1, "M")
+        keep = month_index >= first_month
+        month_index, amounts, categories = month_index[keep], amounts[keep], categories[keep]
+
+    spend = np.where(amounts < 0, -amounts, 0.0)
+    income = np.where(amounts > 0, amounts, 0.0)
+
+    # Group by category
+    category_names, category_codes = np.unique(categories, return_inverse=True)
+    category_spend = np.bincount(category_codes, weights=spend, minlength=category_names.size)
+    category_count = np.bincount(category_codes, weights=(spend > 0), minlength=category_names.size)
+    order = np.argsort(-category_spend)
+    by_category = [
+        {"category": str(category_names[i]), "spend": round(float(category_spend[i]), 2), "count": int(category_count[i])}
+        for i in order if category_spend[i] > 0
+    ]
+
+    # Group by month over a contiguous month range, so gaps show up as zero
+    first, last = month_index.min(), month_index.max()
+    month_range = np.arange(first, last + np.timedelta64(1, "M"))
+    month_codes = (month_index - first).astype(np.int64)
+    month_spend = np.bincount(month_codes, weights=spend, minlength=month_range.size)
+    month_income = np.bincount(month_codes, weights=income, minlength=month_range.size)
+
+    deltas = np.concatenate(([np.nan], np.diff(month_spend)))
+    window = max(1, min(rolling_window, month_range.size))
+    cumulative = np.concatenate(([0.0], np.cumsum(month_spend)))
+    rolling = np.full(month_range.size, np.nan)
+    rolling[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+
+    by_month = [
+        {
+            "month": str(month_range[i]),
+            "spend": round(float(month_spend[i]), 2),
+            "income": round(float(month_income[i]), 2),
+            "spend_delta": None if np.isnan(deltas[i]) else round(float(deltas[i]), 2),
+            "rolling_avg_spend": None if np.isnan(rolling[i]) else round(float(rolling[i]), 2),
+        }
+        for i in range(month_range.size)
+    ]
+
+    return {
+        "by_category": by_category,
+        "by_month": by_month,
+        "total_spend": round(float(spend.sum()), 2),
+        "total_income": round(float(income.sum()), 2),
+    }
+
+@router.get("")
+def get_analytics(
+    user_id: str = Query(None),
+    months: int = Query(None, ge=1),
+    rolling_window: int = Query(3, ge=1, le=24),
+    secret: str = Header(None),
+    authorization: str = Header(None)
+):
+    """
+    Spend-by-category and spend-by-month breakdowns for a user's transactions
+    """
+    # Authentication logic
+    if secret == API_KEY:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="user_id is required with API key")
+        logging.info(f"/api/v1/analytics called with API key for user_id={user_id}")
+    elif authorization and authorization.startswith("Bearer "):
+        token = authorization.split(" ", 1)[1]
+        user_id_from_jwt = verify_jwt(token)
+        if not user_id_from_jwt:
+            raise HTTPException(status_code=401, detail="Invalid JWT token")
+        user_id = user_id_from_jwt
+        logging.info(f"/api/v1/analytics called with JWT for user_id={user_id}")
+    else:
+        raise HTTPException(status_code=401, detail="Missing or invalid API key or JWT")
+
+    # Results only change when a sync ingests new transactions
+    settings_resp = get_table("om_user_settings").select("sf_last_sync").eq("id", user_id).execute()
+    last_sync = settings_resp.data[0].get("sf_last_sync") if settings_resp.data else None
+    cached = cache.get("analytics", user_id, months, rolling_window)
+    if cached and cached["last_sync"] == last_sync:
+        return cached
+
+    try:
+        posted, amounts, categories = load_transaction_columns(user_id)
+    except Exception as e:
+        logging.error(f"Error loading transactions for analytics, user_id={user_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    result = compute_analytics(posted, amounts, categories, months=months, rolling_window=rolling_window)
+    result["last_sync"] = last_sync
+
+    cache.set("analytics", user_id, months, rolling_window, value=result, ttl=ANALYTICS_CACHE_TTL, user_id=user_id)
+    return result
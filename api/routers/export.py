@@ -0,0 +1,276 @@
+from fastapi import APIRouter, HTTPException, Query, Header
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+import csv
+import io
+import os
+import logging
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from jose import jwt, JWTError
+
+# Parquet export is optional; the other formats work without pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+    responses={404: {"description": "Not found"}},
+)
+
+load_dotenv()
+
+# Initialize Supabase client
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+API_KEY = os.getenv("API_KEY")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Rows fetched per page; also the size of each CSV chunk / Parquet row group
+CHUNK_SIZE = 1000
+
+ACCOUNT_COLUMNS = [
+    "sf_account_id", "sf_account_name", "sf_name", "display_name", "category",
+    "balance", "sf_balance_date", "source", "hidden",
+]
+TRANSACTION_COLUMNS = [
+    "sf_account_id", "sf_transaction_id", "posted", "transacted_at", "amount",
+    "description", "payee", "memo", "pending", "category", "auto_category",
+    "is_transfer", "duplicate_of", "duplicate_candidate_of",
+]
+DATASETS = {
+    "accounts": ("om_user_accounts", ACCOUNT_COLUMNS),
+    "transactions": ("om_user_transactions", TRANSACTION_COLUMNS),
+}
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "ofx": "application/x-ofx",
+}
+
+def get_table(table_name: str):
+    # Use public schema explicitly
+    return supabase.schema("public").table(table_name)
+
+def verify_jwt(token: str):
+    try:
+        payload = jwt.decode(
+            token,
+            SUPABASE_JWT_SECRET,
+            algorithms=["HS256"],
+            audience="authenticated"
+        )
+        return payload.get("sub")  # sub is the user_id
+    except JWTError as e:
+        logging.warning(f"JWT verification failed: {str(e)}")
+        return None
+
+def iter_pages(table_name: str, columns: list, user_id: str, **filters):
+    """
+    Yield a user's rows page by page using keyset pagination on id.
+
+    PostgREST has no server-side cursors; seeking past the last seen id
+    gives the same constant-memory, constant-cost-per-page behaviour, unlike
+    offset paging, which gets slower with every page. PostgREST may cap a
+    page below CHUNK_SIZE, so only an empty page ends the scan.
+    """
+    last_id = None
+    while True:
+        query = get_table(table_name).select(",".join(["id"] + columns)).eq("user_id", user_id)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(CHUNK_SIZE).execute().data or []
+        if not page:
+            return
+        last_id = page[-1]["id"]
+        yield [{column: row.get(column) for column in columns} for row in page]
+
+def stream_csv(table_name: str, columns: list, user_id: str):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for page in iter_pages(table_name, columns, user_id):
+        writer.writerows(page)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after each row group"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_parquet(table_name: str, columns: list, user_id: str):
+    sink = _ChunkSink()
+    # Everything as strings, matching what PostgREST returns for numeric columns
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for page in iter_pages(table_name, columns, user_id):
+            arrays = [pa.array([None if row[c] is None else str(row[c]) for row in page], pa.string()) for c in columns]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def _ofx_date(epoch) -> str:
+    if not epoch:
+        return ""
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).strftime("%Y%m%d%H%M%S")
+
+# Account category keyword -> OFX ACCTTYPE; other accounts are CHECKING.
+# Credit cards get a credit card statement instead (see _is_credit_card)
+OFX_ACCOUNT_TYPES = (
+    ("saving", "SAVINGS"),
+    ("money market", "MONEYMRKT"),
+    ("line of credit", "CREDITLINE"),
+)
+
+def _is_credit_card(account) -> bool:
+    return "credit card" in (account.get("category") or "").lower()
+
+def _ofx_account_type(account) -> str:
+    category = (account.get("category") or "").lower()
+    return next((ofx_type for keyword, ofx_type in OFX_ACCOUNT_TYPES if keyword in category), "CHECKING")
+
+def _ofx_transactions(user_id: str, account_id: str):
+    for transactions in iter_pages("om_user_transactions", TRANSACTION_COLUMNS, user_id, sf_account_id=account_id):
+        chunk = []
+        for tx in transactions:
+            # Pending transactions have no posted date and are not on a statement yet
+            if not tx["posted"]:
+                continue
+            amount = float(tx["amount"] or 0)
+            chunk.append(
+                f"<STMTTRN><TRNTYPE>{'CREDIT' if amount >= 0 else 'DEBIT'}</TRNTYPE>"
+                f"<DTPOSTED>{_ofx_date(tx['posted'])}</DTPOSTED><TRNAMT>{tx['amount']}</TRNAMT>"
+                f"<FITID>{escape(tx['sf_transaction_id'] or '')}</FITID>"
+                f"<NAME>{escape((tx['payee'] or tx['description'] or '')[:32])}</NAME>"
+                f"<MEMO>{escape(tx['memo'] or tx['description'] or '')}</MEMO></STMTTRN>\n"
+            )
+        yield "".join(chunk)
+
+def _ofx_statement(user_id: str, account: dict, now: str):
+    """
+    One statement: a bank statement (STMTRS) or, for credit cards, a credit
+    card statement (CCSTMTRS). BANKID is left out; SimpleFIN gives no
+    routing number, and the institution name is not one.
+    """
+    account_id = escape(account["sf_account_id"] or "")
+    card = _is_credit_card(account)
+    if card:
+        yield (
+            f"<CCSTMTTRNRS><TRNUID>{account_id}</TRNUID><STATUS><CODE>0</CODE><SEVERITY>INFO</SEVERITY></STATUS>"
+            f"<CCSTMTRS><CURDEF>USD</CURDEF><CCACCTFROM><ACCTID>{account_id}</ACCTID></CCACCTFROM>\n<BANKTRANLIST>\n"
+        )
+    else:
+        yield (
+            f"<STMTTRNRS><TRNUID>{account_id}</TRNUID><STATUS><CODE>0</CODE><SEVERITY>INFO</SEVERITY></STATUS>"
+            f"<STMTRS><CURDEF>USD</CURDEF><BANKACCTFROM><ACCTID>{account_id}</ACCTID>"
+            f"<ACCTTYPE>{_ofx_account_type(account)}</ACCTTYPE></BANKACCTFROM>\n<BANKTRANLIST>\n"
+        )
+    yield from _ofx_transactions(user_id, account["sf_account_id"])
+    closing = "</CCSTMTRS></CCSTMTTRNRS>" if card else "</STMTRS></STMTTRNRS>"
+    yield (
+        f"</BANKTRANLIST><LEDGERBAL><BALAMT>{account['balance'] or 0}</BALAMT>"
+        f"<DTASOF>{_ofx_date(account['sf_balance_date']) or now}</DTASOF></LEDGERBAL>{closing}\n"
+    )
+
+def stream_ofx(user_id: str):
+    """
+    OFX 2 document with one statement per account, bank accounts in the
+    bank message set and credit cards in the credit card message set.
+    Accounts are read up front, transactions are streamed account by account.
+    """
+    now = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    accounts = [account for page in iter_pages("om_user_accounts", ACCOUNT_COLUMNS, user_id) for account in page]
+    cards = [account for account in accounts if _is_credit_card(account)]
+    banks = [account for account in accounts if not _is_credit_card(account)]
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<?OFX OFXHEADER="200" VERSION="220" SECURITY="NONE" OLDFILEUID="NONE" NEWFILEUID="NONE"?>\n'
+        "<OFX><SIGNONMSGSRSV1><SONRS><STATUS><CODE>0</CODE><SEVERITY>INFO</SEVERITY></STATUS>"
+        f"<DTSERVER>{now}</DTSERVER><LANGUAGE>ENG</LANGUAGE></SONRS></SIGNONMSGSRSV1>\n"
+    )
+    if banks:
+        yield "<BANKMSGSRSV1>\n"
+        for account in banks:
+            yield from _ofx_statement(user_id, account, now)
+        yield "</BANKMSGSRSV1>\n"
+    if cards:
+        yield "<CREDITCARDMSGSRSV1>\n"
+        for account in cards:
+            yield from _ofx_statement(user_id, account, now)
+        yield "</CREDITCARDMSGSRSV1>\n"
+    yield "</OFX>\n"
+
+@router.get("")
+def export_data(
+    user_id: str = Query(None),
+    format: str = Query("csv", pattern="^(csv|parquet|ofx)$"),
+    dataset: str = Query("transactions", pattern="^(accounts|transactions)$"),
+    secret: str = Header(None),
+    authorization: str = Header(None)
+):
+    """
+    Stream a user's accounts or transactions as CSV or Parquet, or both as OFX
+    """
+    # Authentication logic
+    if secret == API_KEY:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="user_id is required with API key")
+        logging.info(f"/api/v1/export called with API key for user_id={user_id}")
+    elif authorization and authorization.startswith("Bearer "):
+        token = authorization.split(" ", 1)[1]
+        user_id_from_jwt = verify_jwt(token)
+        if not user_id_from_jwt:
+            raise HTTPException(status_code=401, detail="Invalid JWT token")
+        user_id = user_id_from_jwt
+        logging.info(f"/api/v1/export called with JWT for user_id={user_id}")
+    else:
+        raise HTTPException(status_code=401, detail="Missing or invalid API key or JWT")
+
+    table_name, columns = DATASETS[dataset]
+    if format == "csv":
+        body = stream_csv(table_name, columns, user_id)
+    elif format == "parquet":
+        if pa is None:
+            raise HTTPException(status_code=501, detail="Parquet export is not available on this server")
+        body = stream_parquet(table_name, columns, user_id)
+    else:
+        # OFX statements always carry accounts with their transactions
+        dataset = "statements"
+        body = stream_ofx(user_id)
+
+    filename = f"otter_money_{dataset}_{datetime.now(timezone.utc).strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,238 @@
+from fastapi import APIRouter, HTTPException, Query, Header
+from fastapi.responses import FileResponse, Response
+from functools import lru_cache
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import re
+
+router = APIRouter(
+    prefix="/logos",
+    tags=["logos"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Directory written by scripts/improved_free_bank_logos.py
+LOGO_DIR = os.getenv("LOGO_DIR", "standardized_bank_logos")
+
+# Logos are addressed by content hash, so a URL never changes meaning
+LOGO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Logo files come from third parties and SVGs can carry script, so a logo
+# opened directly must not run anything on the app origin
+LOGO_SECURITY_HEADERS = {
+    "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+    "X-Content-Type-Options": "nosniff",
+}
+
+# Preferred source when a bank has logos from several sources
+SOURCE_PRIORITY = {"clearbit": 0, "icon_horse": 1}
+
+MEDIA_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".gif": "image/gif",
+    ".ico": "image/x-icon",
+    ".svg": "image/svg+xml",
+    ".webp": "image/webp",
+}
+
+# Words that carry no identity in institution names ("Bank of X, N.A.")
+STOPWORDS = {
+    "the", "of", "and", "bank", "banks", "banking", "na", "inc", "corp", "corporation",
+    "co", "company", "group", "holdings", "financial", "services", "llc", "plc", "ltd",
+}
+
+MIN_MATCH_SCORE = 0.5
+
+# Normalized rendition served by /logos/{logo_id}, and default sprite size
+SERVED_SIZE = 128
+DEFAULT_SPRITE_SIZE = "32"
+
+def normalize_name(name: str) -> tuple:
+    """Lowercase, strip punctuation and generic words; returns the remaining tokens"""
+    name = name.lower().replace("&", " and ").replace(".", "")
+    tokens = re.findall(r"[a-z0-9]+", name)
+    return tuple(t for t in tokens if t not in STOPWORDS)
+
+def _locate(recorded_path: str, logo_dir: str):
+    """Find a file recorded in bank_index.json, also when the logo directory has moved"""
+    path = Path(recorded_path)
+    for candidate in (path, Path(logo_dir) / path.name, Path(logo_dir) / "normalized" / path.name):
+        if candidate.exists():
+            return candidate
+    return None
+
+class LogoIndex:
+    """
+    In-memory match index over the logo fetcher's bank_index.json.
+
+    Built once at startup. Names resolve by exact normalized name, then by
+    domain stem ("chase" for chase.com), then by best token overlap through
+    an inverted token index. Resolutions are memoized, so repeated sf_name
+    lookups are dictionary hits.
+    """
+
+    def __init__(self, entries: list, sprites: dict = None):
+        self.sprites = sprites or {}
+        self.logos = {}          # logo_id -> entry
+        self.by_name = {}        # normalized name -> logo_id
+        self.by_stem = {}        # domain stem / compact name -> logo_id
+        self.by_token = {}       # token -> set of logo_ids
+        self.tokens = {}         # logo_id -> token set
+        for entry in sorted(entries, key=lambda e: SOURCE_PRIORITY.get(e["source"], len(SOURCE_PRIORITY))):
+            logo_id = entry["logo_id"]
+            self.logos.setdefault(logo_id, entry)
+            name_tokens = normalize_name(entry["bank_name"])
+            self.by_name.setdefault(" ".join(name_tokens), logo_id)
+            self.by_stem.setdefault("".join(name_tokens), logo_id)
+            if entry.get("domain"):
+                self.by_stem.setdefault(entry["domain"].split(".")[0].replace("-", ""), logo_id)
+            tokens = self.tokens.setdefault(logo_id, set())
+            tokens.update(name_tokens)
+            for token in name_tokens:
+                self.by_token.setdefault(token, set()).add(logo_id)
+        self.resolve = lru_cache(maxsize=4096)(self._resolve)
+
+    @classmethod
+    def load(cls, logo_dir: str = LOGO_DIR) -> "LogoIndex":
+        index_file = Path(logo_dir) / "bank_index.json"
+        if not index_file.exists():
+            logging.warning(f"Logo index not found at {index_file}; logo lookups disabled")
+            return cls([])
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        banks = index.get("banks", [])
+        entries = []
+        for bank in banks:
+            # Prefer the normalized rendition from scripts/normalize_bank_logos.py
+            local_file = (bank.get("normalized") or {}).get(str(SERVED_SIZE)) or bank.get("local_file")
+            if not local_file:
+                continue
+            path = _locate(local_file, logo_dir)
+            if not path:
+                continue
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            entries.append({
+                "logo_id": digest[:32],
+                "etag": f'"{digest}"',
+                "path": str(path),
+                "media_type": MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream"),
+                "bank_name": bank["bank_name"],
+                "domain": bank.get("domain"),
+                "source": bank["source"],
+                "logo_hash": bank.get("logo_hash"),
+            })
+        logging.info(f"Loaded {len(entries)} logos from {index_file}")
+        return cls(entries, sprites=cls._load_sprites(index.get("sprites") or {}, logo_dir))
+
+    @staticmethod
+    def _load_sprites(sprites: dict, logo_dir: str) -> dict:
+        loaded = {}
+        for size, sprite in sprites.items():
+            path = _locate(sprite["file"], logo_dir)
+            if not path:
+                continue
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            loaded[size] = {
+                "path": str(path),
+                "etag": f'"{digest}"',
+                "url": f"/api/v1/logos/sprites/{size}?v={digest[:12]}",
+                "width": sprite["width"],
+                "height": sprite["height"],
+                "icons": sprite["icons"],
+            }
+        return loaded
+
+    def _resolve(self, name: str):
+        tokens = normalize_name(name)
+        if not tokens:
+            return None
+        logo_id = self.by_name.get(" ".join(tokens)) or self.by_stem.get("".join(tokens))
+        if logo_id:
+            return logo_id
+        for token in tokens:
+            if token in self.by_stem:
+                return self.by_stem[token]
+        # Score only candidates that share at least one token
+        query = set(tokens)
+        candidates = set()
+        for token in query:
+            candidates |= self.by_token.get(token, set())
+        best_id, best_score = None, 0.0
+        for candidate in candidates:
+            candidate_tokens = self.tokens[candidate]
+            score = len(query & candidate_tokens) / len(query | candidate_tokens)
+            if score > best_score:
+                best_id, best_score = candidate, score
+        return best_id if best_score >= MIN_MATCH_SCORE else None
+
+    def logo_url(self, name: str):
+        if not name:
+            return None
+        logo_id = self.resolve(name)
+        return f"/api/v1/logos/{logo_id}" if logo_id else None
+
+    def sprite_position(self, logo_id: str, size: str = DEFAULT_SPRITE_SIZE):
+        """Location of a logo inside the sprite atlas of the given size"""
+        sprite = self.sprites.get(size)
+        logo_hash = self.logos[logo_id].get("logo_hash")
+        if not sprite or logo_hash not in sprite["icons"]:
+            return None
+        x, y = sprite["icons"][logo_hash]
+        return {"url": sprite["url"], "size": int(size), "x": x, "y": y}
+
+    def logo_sprite(self, name: str):
+        if not name:
+            return None
+        logo_id = self.resolve(name)
+        return self.sprite_position(logo_id) if logo_id else None
+
+logo_index = LogoIndex.load()
+
+@router.get("/resolve")
+def resolve_logo(name: str = Query(...)):
+    """
+    Resolve an institution name (e.g. an account's sf_name) to a logo URL
+    """
+    logo_id = logo_index.resolve(name)
+    if not logo_id:
+        raise HTTPException(status_code=404, detail="No logo found for institution")
+    entry = logo_index.logos[logo_id]
+    return {
+        "logo_url": f"/api/v1/logos/{logo_id}",
+        "sprite": logo_index.sprite_position(logo_id),
+        "bank_name": entry["bank_name"],
+        "domain": entry["domain"],
+    }
+
+@router.get("/sprites/{size}")
+def get_sprite(size: str, if_none_match: str = Header(None)):
+    """
+    Serve a sprite atlas holding every logo at one size
+    """
+    sprite = logo_index.sprites.get(size)
+    if not sprite:
+        raise HTTPException(status_code=404, detail="Sprite not found")
+    # The URL carries a content version, so it is safe to cache as immutable
+    headers = {"ETag": sprite["etag"], "Cache-Control": LOGO_CACHE_CONTROL, **LOGO_SECURITY_HEADERS}
+    if if_none_match and sprite["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(sprite["path"], media_type="image/webp", headers=headers)
+
+@router.get("/{logo_id}")
+def get_logo(logo_id: str, if_none_match: str = Header(None)):
+    """
+    Serve a logo image with a strong ETag and long-lived cache headers.
+    SVGs are only served when no rasterized rendition exists, and always
+    under LOGO_SECURITY_HEADERS.
+    """
+    entry = logo_index.logos.get(logo_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Logo not found")
+    headers = {"ETag": entry["etag"], "Cache-Control": LOGO_CACHE_CONTROL, **LOGO_SECURITY_HEADERS}
+    if if_none_match and entry["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(entry["path"], media_type=entry["media_type"], headers=headers)
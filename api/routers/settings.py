@@ -0,0 +1,186 @@
+from fastapi import APIRouter, HTTPException, Query, Header, Body
+import os
+import logging
+from datetime import datetime
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from jose import jwt, JWTError
+from categorization import normalize_categories, DEFAULT_CATEGORIES
+from profiling import span
+from cache import cache
+
+router = APIRouter(
+    prefix="/settings",
+    tags=["settings"],
+    responses={404: {"description": "Not found"}},
+)
+
+load_dotenv()
+
+# Initialize Supabase client
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+API_KEY = os.getenv("API_KEY")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Every write through PATCH refreshes the entry; the TTL only bounds how long
+# a write made directly against the table stays invisible
+SETTINGS_CACHE_TTL = 5 * 60
+
+SETTINGS_COLUMNS = "id, dark_mode, categories, updated_at"
+# Fields a PATCH may change
+EDITABLE_FIELDS = ("dark_mode", "categories")
+
+def get_table(table_name: str):
+    # Use public schema explicitly
+    return supabase.schema("public").table(table_name)
+
+def verify_jwt(token: str):
+    try:
+        with span("auth"):
+            payload = jwt.decode(
+                token,
+                SUPABASE_JWT_SECRET,
+                algorithms=["HS256"],
+                audience="authenticated"
+            )
+        return payload.get("sub")  # sub is the user_id
+    except JWTError as e:
+        logging.warning(f"JWT verification failed: {str(e)}")
+        return None
+
+def authenticate(user_id, secret, authorization) -> str:
+    if secret == API_KEY:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="user_id is required with API key")
+        return user_id
+    if authorization and authorization.startswith("Bearer "):
+        token = authorization.split(" ", 1)[1]
+        user_id_from_jwt = verify_jwt(token)
+        if not user_id_from_jwt:
+            raise HTTPException(status_code=401, detail="Invalid JWT token")
+        return user_id_from_jwt
+    raise HTTPException(status_code=401, detail="Missing or invalid API key or JWT")
+
+def merge_patch(target, patch):
+    """Apply an RFC 7386 JSON merge patch: objects merge, null deletes, anything else replaces"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+def with_canonical_categories(row: dict) -> dict:
+    # Rows written before validation existed are repaired leniently on read.
+    # Entries that had to be left out are returned in categories_dropped;
+    # they stay stored until the user saves the list they are in
+    dropped = []
+    row["categories"] = normalize_categories(row.get("categories"), strict=False, dropped=dropped)
+    row["categories_dropped"] = dropped
+    if dropped:
+        logging.warning(f"Left out {len(dropped)} invalid category entries for user {row['id']}: "
+                        + "; ".join(f"{d['path']}: {d['reason']}" for d in dropped))
+    return row
+
+def load_settings(user_id: str) -> dict:
+    """
+    The user's settings with categories in canonical shape, from the cache
+    when possible. Users without a settings row get the defaults.
+    """
+    cached = cache.get("settings", user_id)
+    if cached is not None:
+        return cached
+    with span("db.om_user_settings.select"):
+        resp = get_table("om_user_settings").select(SETTINGS_COLUMNS).eq("id", user_id).execute()
+    row = resp.data[0] if resp.data else {"id": user_id, "dark_mode": None, "categories": None, "updated_at": None}
+    row = with_canonical_categories(row)
+    cache.set("settings", user_id, value=row, ttl=SETTINGS_CACHE_TTL, user_id=user_id)
+    return row
+
+def stored_categories(user_id: str) -> dict:
+    """The categories document as stored, legacy shape and invalid entries included"""
+    with span("db.om_user_settings.select"):
+        resp = get_table("om_user_settings").select("categories").eq("id", user_id).execute()
+    categories = resp.data[0].get("categories") if resp.data else None
+    if categories is None:
+        return DEFAULT_CATEGORIES
+    if isinstance(categories, list):
+        return {"account_categories": categories}
+    return categories if isinstance(categories, dict) else {}
+
+def patch_categories(stored: dict, patch) -> dict:
+    """
+    Apply a merge patch to the stored categories. Only the lists the patch
+    names are validated and normalized; the others are written back as
+    stored, so a PATCH never persists what a lenient read left out.
+    """
+    if not isinstance(patch, dict):
+        return normalize_categories(patch)
+    merged = merge_patch(stored, patch)
+    named = {key: merged[key] for key in patch if key in merged}
+    normalized = normalize_categories(named)
+    return {**merged, **{key: normalized[key] for key in named}}
+
+@router.get("")
+def get_settings(
+    user_id: str = Query(None),
+    secret: str = Header(None),
+    authorization: str = Header(None)
+):
+    """
+    Dark mode and categories, categories always in canonical shape.
+    categories_dropped lists stored entries that are invalid and left out.
+    """
+    user_id = authenticate(user_id, secret, authorization)
+    return load_settings(user_id)
+
+@router.patch("")
+def patch_settings(
+    patch: dict = Body(...),
+    user_id: str = Query(None),
+    secret: str = Header(None),
+    authorization: str = Header(None)
+):
+    """
+    Update settings with a JSON merge patch, e.g. {"dark_mode": true} or
+    {"categories": {"transaction_categories": [...]}}. Only the columns named
+    in the patch are written; categories are validated and normalized first.
+    """
+    user_id = authenticate(user_id, secret, authorization)
+    unknown = set(patch) - set(EDITABLE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown or read-only settings: {', '.join(sorted(unknown))}")
+
+    current = load_settings(user_id)
+    changes = {}
+    if "dark_mode" in patch:
+        if patch["dark_mode"] is not None and not isinstance(patch["dark_mode"], bool):
+            raise HTTPException(status_code=422, detail="dark_mode must be true, false or null")
+        changes["dark_mode"] = patch["dark_mode"]
+    if "categories" in patch:
+        try:
+            changes["categories"] = patch_categories(stored_categories(user_id), patch["categories"])
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    if not changes:
+        return current
+    changes["updated_at"] = datetime.utcnow().isoformat()
+    try:
+        with span("db.om_user_settings.upsert"):
+            get_table("om_user_settings").upsert({"id": user_id, **changes}).execute()
+    except Exception as e:
+        logging.error(f"Error updating settings for user {user_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    updated = {**current, **changes}
+    if "categories" in changes:
+        updated = with_canonical_categories(updated)
+    cache.set("settings", user_id, value=updated, ttl=SETTINGS_CACHE_TTL, user_id=user_id)
+    return updated
@@ -1,11 +1,21 @@
 from fastapi import APIRouter, HTTPException, Query, Header
-import requests
+from fastapi.responses import JSONResponse
 import os
+import time
+import asyncio
+import threading
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from jose import jwt, JWTError
+from categorization import compile_rules
+from transfers import flag_duplicates, link_transfers
+from profiling import span
+from projection import parse_fields, project_accounts
+from cache import cache
+from simplefin import get_connections, stream_accounts, all_failed, SYNC_COOLDOWN_MINUTES
+from sync_ledger import SyncRun, fleet_stats
 
 router = APIRouter(
     prefix="/sync",
@@ -29,25 +39,223 @@ def get_table(table_name: str):
 
 def verify_jwt(token: str):
     try:
-        payload = jwt.decode(
-            token,
-            SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            audience="authenticated"
-        )
+        with span("auth"):
+            payload = jwt.decode(
+                token,
+                SUPABASE_JWT_SECRET,
+                algorithms=["HS256"],
+                audience="authenticated"
+            )
         return payload.get("sub")  # sub is the user_id
     except JWTError as e:
         logging.warning(f"JWT verification failed: {str(e)}")
         return None
 
+# Rows per upsert request when ingesting transactions
+TRANSACTION_BATCH_SIZE = 1000
+# Ids per delete request; they travel in the URL
+PENDING_DELETE_BATCH_SIZE = 100
+TRANSACTION_CONFLICT = "user_id,sf_account_id,sf_transaction_id,posted"
+
+def transaction_row(user_id: str, account_id: str, tx: dict, synced_at: str):
+    """The om_user_transactions row for a SimpleFIN transaction, None if it has no id or amount"""
+    if not tx.get("id") or tx.get("amount") in (None, ""):
+        return None
+    return {
+        "user_id": user_id,
+        "sf_account_id": account_id,
+        "sf_transaction_id": tx["id"],
+        # Pending transactions have no posted date; 0 keeps them in
+        # the default partition and satisfies the primary key
+        "posted": tx.get("posted") or 0,
+        "transacted_at": tx.get("transacted_at"),
+        "amount": str(tx.get("amount")),
+        "description": tx.get("description"),
+        "payee": tx.get("payee"),
+        "memo": tx.get("memo"),
+        "pending": bool(tx.get("pending", False)),
+        # Written by link_transactions once the whole sync has been seen
+        "duplicate_of": None,
+        "duplicate_candidate_of": None,
+        "transfer_id": None,
+        "is_transfer": False,
+        "updated_at": synced_at
+    }
+
+class TransactionIngest:
+    """
+    Consumes SimpleFIN events as they are parsed (see simplefin.stream_accounts)
+    and upserts transactions in batches of TRANSACTION_BATCH_SIZE, assigning
+    auto_category from the user's compiled categorization rules.
+
+    The user's own choice lives in `category` and is never touched here.
+    `posted` is part of the conflict key (the table is partitioned on it), so
+    a pending transaction that has since posted would be kept twice. Pending
+    rows are upserted like any other, keeping their `category`, and
+    drop_stale_pending deletes the stored ones the stream no longer
+    delivered once it has ended.
+
+    Duplicate and transfer detection needs every linked account's history
+    at once, so the rows are kept after they are written and the links are
+    written by link_transactions after the stream ends. Raw transactions
+    are kept only when keep_transactions is set, for callers that return
+    them.
+    """
+
+    def __init__(self, user_id: str, synced_at: str, keep_transactions: bool = False):
+        self.user_id = user_id
+        self.synced_at = synced_at
+        self.keep_transactions = keep_transactions
+        self.accounts = []
+        self.transactions = {}  # account id -> raw transactions, if kept
+        self.rows = []  # every row built, for link_transactions
+        self.batch = []
+        self.pending = {}  # account id -> sf_transaction_ids still pending
+        self.count = 0
+        # Batches of concurrent connections are written from separate threads
+        self.count_lock = threading.Lock()
+        self.failed = 0
+        self.db_seconds = 0.0
+        with span("load_rules"):
+            settings_resp = get_table("om_user_settings").select("categories").eq("id", user_id).execute()
+        categories = settings_resp.data[0].get("categories") if settings_resp.data else None
+        self.rules = compile_rules(categories)
+
+    async def __call__(self, event):
+        if event[0] == "account":
+            account = event[1]
+            if self.keep_transactions:
+                account["transactions"] = self.transactions.pop(account.get("id"), [])
+            self.accounts.append(account)
+            return
+        _, account, tx = event
+        account_id = account.get("id")
+        if self.keep_transactions:
+            self.transactions.setdefault(account_id, []).append(tx)
+        # Rows are keyed by account; without an id there is nothing to store
+        if not account_id:
+            return
+        row = transaction_row(self.user_id, account_id, tx, self.synced_at)
+        if row is None:
+            return
+        if not row["posted"]:
+            self.pending.setdefault(account_id, set()).add(row["sf_transaction_id"])
+        self.rows.append(row)
+        self.batch.append(row)
+        if len(self.batch) >= TRANSACTION_BATCH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        rows, self.batch = self.batch, []
+        if not rows:
+            return
+        started = time.perf_counter()
+        try:
+            # The Supabase client blocks; keep the other connections streaming
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            # A failed batch must not abort the stream; the accounts are still stored
+            logging.error(f"Error ingesting transactions for user {self.user_id}: {str(e)}")
+            self.failed += len(rows)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+
+    def _write(self, rows):
+        if self.rules:
+            with span("categorize"):
+                for row, category in zip(rows, self.rules.categorize(rows)):
+                    row["auto_category"] = category
+
+        with span("upsert.om_user_transactions"):
+            get_table("om_user_transactions").upsert(rows, on_conflict=TRANSACTION_CONFLICT).execute()
+        with self.count_lock:
+            self.count += len(rows)
+
+    def drop_stale_pending(self) -> int:
+        """
+        Delete the stored pending rows of the streamed accounts that this
+        sync did not deliver again: they have posted, under their posted
+        row, or were cancelled. Accounts whose connection failed are not in
+        self.accounts and keep theirs. Returns the number of rows deleted.
+        """
+        account_ids = [account["id"] for account in self.accounts if account.get("id")]
+        if not account_ids:
+            return 0
+        stale = {}
+        last_id = None
+        while True:
+            query = (
+                get_table("om_user_transactions")
+                .select("id, sf_account_id, sf_transaction_id")
+                .eq("user_id", self.user_id)
+                .eq("posted", 0)
+                .in_("sf_account_id", account_ids)
+            )
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            with span("select.pending"):
+                page = query.order("id").limit(TRANSACTION_BATCH_SIZE).execute().data or []
+            if not page:
+                break
+            last_id = page[-1]["id"]
+            for row in page:
+                if row["sf_transaction_id"] not in self.pending.get(row["sf_account_id"], ()):
+                    stale.setdefault(row["sf_account_id"], []).append(row["sf_transaction_id"])
+
+        deleted = 0
+        for account_id, tx_ids in stale.items():
+            for start in range(0, len(tx_ids), PENDING_DELETE_BATCH_SIZE):
+                with span("delete.pending"):
+                    (
+                        get_table("om_user_transactions").delete()
+                        .eq("user_id", self.user_id)
+                        .eq("posted", 0)
+                        .eq("sf_account_id", account_id)
+                        .in_("sf_transaction_id", tx_ids[start:start + PENDING_DELETE_BATCH_SIZE])
+                        .execute()
+                    )
+            deleted += len(tx_ids)
+        return deleted
+
+    def link_transactions(self):
+        """
+        Flag re-delivered duplicates and transfers between the user's
+        accounts so analytics can exclude them. Every row was first written
+        with its links cleared, so a row that no longer matches loses its old
+        flags; the flagged rows are then written again in full, in the same
+        shape as the first write. Raises if a write fails.
+        """
+        rows = self.rows
+        with span("detect_transfers"):
+            duplicates = flag_duplicates(rows)
+            transfers = link_transfers(rows)
+        candidates = sum(1 for row in rows if row["duplicate_candidate_of"])
+        if duplicates or candidates or transfers:
+            logging.info(f"Flagged {duplicates} duplicates, {candidates} possible duplicates and {transfers} transfers for user_id={self.user_id}")
+
+        flagged = [row for row in rows if row["duplicate_of"] or row["duplicate_candidate_of"] or row["is_transfer"]]
+        for start in range(0, len(flagged), TRANSACTION_BATCH_SIZE):
+            with span("upsert.om_user_transactions.links"):
+                get_table("om_user_transactions").upsert(
+                    flagged[start:start + TRANSACTION_BATCH_SIZE],
+                    on_conflict=TRANSACTION_CONFLICT
+                ).execute()
+
 @router.get("/")
 async def get_accounts(
     user_id: str = Query(None),
+    fields: str = Query(None, description="Comma-separated account fields to return, e.g. id,name,balance,org.name"),
+    include_transactions: bool = Query(True),
     secret: str = Header(None),
     authorization: str = Header(None)
 ):
     """
-    Fetch accounts from SimpleFIN for a specific user and update balances
+    Fetch accounts from SimpleFIN for a specific user and update balances.
+
+    The full document is always ingested; `fields` and `include_transactions`
+    only shape the response. Responses are stream-parsed, so memory stays
+    flat with include_transactions=false; returning transactions means
+    holding them until the response is built.
     """
     # Authentication logic
     if secret == API_KEY:
@@ -67,18 +275,27 @@ async def get_accounts(
 
     if not user_id:
         raise HTTPException(status_code=400, detail="user_id is required")
+
+    # Reject a bad fields= before any SimpleFIN or database work
+    try:
+        parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     
     # Check cooldown for JWT requests (not API key requests)
     is_jwt_request = authorization and authorization.startswith("Bearer ")
     if is_jwt_request:
         try:
             # Check last sync time
-            settings_resp = get_table("om_user_settings").select("sf_last_sync").eq("id", user_id).single().execute()
+            with span("cooldown_check"):
+                settings_resp = await asyncio.to_thread(
+                    get_table("om_user_settings").select("sf_last_sync").eq("id", user_id).single().execute
+                )
             if settings_resp.data and settings_resp.data.get("sf_last_sync"):
                 last_sync = datetime.fromisoformat(settings_resp.data["sf_last_sync"].replace('Z', '+00:00'))
                 now = datetime.utcnow().replace(tzinfo=last_sync.tzinfo)
                 time_since_sync = now - last_sync
-                cooldown_minutes = 15
+                cooldown_minutes = SYNC_COOLDOWN_MINUTES
                 
                 if time_since_sync.total_seconds() < (cooldown_minutes * 60):
                     remaining_seconds = (cooldown_minutes * 60) - time_since_sync.total_seconds()
@@ -95,34 +312,41 @@ async def get_accounts(
             logging.warning(f"Error checking cooldown for user {user_id}: {str(e)}")
             # Continue with sync if cooldown check fails
     
-    # Lookup user's SimpleFIN token from database
+    # Lookup user's SimpleFIN connections from database
     try:
-        user_resp = get_table("om_user_simplefin_tokens").select("simplefin_token, user_id").eq("user_id", user_id).single().execute()
-        if not user_resp.data or not user_resp.data.get("simplefin_token"):
-            raise HTTPException(
-                status_code=404, 
-                detail="User or SimpleFIN token not found. Please configure your SimpleFIN access token."
-            )
-        
-        simplefin_token = user_resp.data["simplefin_token"]
-        
-        # Ensure the URL ends with /accounts
-        if not simplefin_token.rstrip('/').endswith('/accounts'):
-            simplefin_token = simplefin_token.rstrip('/') + '/accounts'
-            
+        connections = await asyncio.to_thread(get_connections, get_table, user_id)
     except Exception as e:
         raise HTTPException(
             status_code=500, 
             detail=f"Error looking up user SimpleFIN token: {str(e)}"
         )
+    if not connections:
+        raise HTTPException(
+            status_code=404, 
+            detail="User or SimpleFIN token not found. Please configure your SimpleFIN access token."
+        )
+    
+    # Stream all connections concurrently; each one fails on its own.
+    # Transactions are written in batches while the responses are parsed
+    run = SyncRun(user_id, trigger="api_key" if secret == API_KEY else "user")
+    current_time = datetime.utcnow().isoformat()
+    # The client blocks, here and below; keep it off the event loop
+    ingest = await asyncio.to_thread(TransactionIngest, user_id, current_time, keep_transactions=include_transactions)
+    stream_started = time.perf_counter()
+    simplefin_data = await stream_accounts(connections, ingest)
+    run.fetched(simplefin_data, time.perf_counter() - stream_started, ingest.db_seconds)
+    if all_failed(simplefin_data, connections):
+        errors = "; ".join(str(e["error"]) for e in simplefin_data["connection_errors"])
+        await asyncio.to_thread(run.finish, get_table, "failed", simplefin_data["connection_errors"][0]["error_class"], errors)
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Error fetching accounts from SimpleFIN: {errors}"
+        )
+    for failed in simplefin_data["connection_errors"]:
+        logging.warning(f"SimpleFIN connection {failed['connection_id']} failed for user {user_id}: {failed['status']} {failed['error']}")
     
     try:
-        # Fetch accounts from SimpleFIN
-        response = requests.get(simplefin_token)
-        response.raise_for_status()
-        
-        simplefin_data = response.json()
-        accounts = simplefin_data.get("accounts", [])
+        accounts = ingest.accounts
         
         # Update account balances in the database using upsert
         logging.info(f"Processing {len(accounts)} accounts for user {user_id}")
@@ -149,33 +373,131 @@ async def get_accounts(
         # Upsert all accounts at once
         if upsert_data:
             try:
-                resp = get_table("om_user_accounts").upsert(upsert_data, on_conflict="user_id,sf_account_id").execute()
+                with span("upsert.om_user_accounts"), run.db_write():
+                    resp = await asyncio.to_thread(
+                        get_table("om_user_accounts").upsert(upsert_data, on_conflict="user_id,sf_account_id").execute
+                    )
                 logging.info(f"Successfully upserted {len(upsert_data)} accounts for user_id={user_id}")
             except Exception as e:
                 logging.error(f"Error upserting accounts for user {user_id}: {str(e)}")
                 # Don't fail the entire request
         
+        ingest_error = None
+        try:
+            stream_db_seconds = ingest.db_seconds
+            await ingest.flush()
+            run.db_seconds += ingest.db_seconds - stream_db_seconds
+            with run.db_write():
+                await asyncio.to_thread(ingest.drop_stale_pending)
+                await asyncio.to_thread(ingest.link_transactions)
+            logging.info(f"Ingested {ingest.count} transactions for user_id={user_id}")
+        except Exception as e:
+            logging.error(f"Error ingesting transactions for user {user_id}: {str(e)}")
+            # Don't fail the entire request, but record it in the ledger
+            ingest_error = e
+
         # Update the last sync timestamp in user settings
         try:
-            current_time = datetime.utcnow().isoformat()
-            get_table("om_user_settings").upsert({
-                "id": user_id,
-                "sf_last_sync": current_time,
-                "updated_at": current_time
-            }).execute()
+            with run.db_write():
+                await asyncio.to_thread(get_table("om_user_settings").upsert({
+                    "id": user_id,
+                    "sf_last_sync": current_time,
+                    "sf_accounts_refreshed_at": current_time,
+                    "updated_at": current_time
+                }).execute)
         except Exception as e:
             # Log the error but don't fail the entire request
             logging.warning(f"Failed to update last sync time for user {user_id}: {str(e)}")
+
+        # Everything derived from the user's data is stale now
+        await asyncio.to_thread(cache.invalidate_user, user_id)
+
+        run.account_count = len(accounts)
+        run.transaction_count = ingest.count
+        if simplefin_data["connection_errors"]:
+            first = simplefin_data["connection_errors"][0]
+            await asyncio.to_thread(run.finish, get_table, "partial", first["error_class"], first["error"])
+        elif ingest.failed:
+            await asyncio.to_thread(run.finish, get_table, "partial", "TransactionWriteError",
+                                    f"{ingest.failed} transactions not written")
+        elif ingest_error is not None:
+            await asyncio.to_thread(run.finish, get_table, "partial", type(ingest_error).__name__,
+                                    f"Transaction ingest incomplete: {ingest_error}")
+        else:
+            await asyncio.to_thread(run.finish, get_table, "success")
         
-        return simplefin_data
+        with span("serialize"):
+            document = {
+                "errors": simplefin_data["errors"],
+                "accounts": accounts,
+                "connection_errors": simplefin_data["connection_errors"],
+            }
+            return JSONResponse(content=project_accounts(document, fields, include_transactions))
         
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Error fetching accounts from SimpleFIN: {str(e)}"
-        )
     except Exception as e:
+        await asyncio.to_thread(run.finish, get_table, "failed", type(e).__name__, str(e))
         raise HTTPException(
             status_code=500, 
             detail=f"Unexpected error: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+# Fleet summaries read at most this many runs, in pages of LEDGER_PAGE_SIZE
+RUN_STATS_MAX_RUNS = 50000
+LEDGER_PAGE_SIZE = 1000
+RUN_STATS_COLUMNS = "id, user_id, started_at, duration_ms, fetch_ms, db_ms, bytes_received, transaction_count, outcome, error_class, connections"
+
+@router.get("/runs")
+def get_sync_runs(
+    user_id: str = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    secret: str = Header(None),
+    authorization: str = Header(None)
+):
+    """A user's sync history, newest first"""
+    if secret == API_KEY:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="user_id is required with API key")
+    elif authorization and authorization.startswith("Bearer "):
+        token = authorization.split(" ", 1)[1]
+        user_id_from_jwt = verify_jwt(token)
+        if not user_id_from_jwt:
+            raise HTTPException(status_code=401, detail="Invalid JWT token")
+        user_id = user_id_from_jwt
+    else:
+        raise HTTPException(status_code=401, detail="Missing or invalid API key or JWT")
+
+    with span("db.om_sync_runs.select"):
+        resp = get_table("om_sync_runs").select("*").eq("user_id", user_id).order("started_at", desc=True).limit(limit).execute()
+    return {"runs": resp.data or []}
+
+@router.get("/runs/stats")
+def get_sync_run_stats(
+    days: int = Query(7, ge=1, le=90),
+    secret: str = Header(None)
+):
+    """Fleet-wide sync percentiles, by institution and slowest users; API key only"""
+    if not API_KEY or secret != API_KEY:
+        raise HTTPException(status_code=401, detail="Missing or invalid API key")
+
+    since = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    runs = []
+    while len(runs) < RUN_STATS_MAX_RUNS:
+        with span("db.om_sync_runs.select"):
+            page = (
+                get_table("om_sync_runs")
+                .select(RUN_STATS_COLUMNS)
+                .gte("started_at", since)
+                .order("started_at")
+                .order("id")
+                .range(len(runs), len(runs) + LEDGER_PAGE_SIZE - 1)
+                .execute()
+            ).data or []
+        runs.extend(page)
+        if len(page) < LEDGER_PAGE_SIZE:
+            break
+
+    with span("fleet_stats"):
+        stats = fleet_stats(runs)
+    stats["since"] = since
+    stats["truncated"] = len(runs) >= RUN_STATS_MAX_RUNS
+    return stats
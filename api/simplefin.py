@@ -0,0 +1,246 @@
+"""
+SimpleFIN access for users with one or more bridge connections.
+
+Each row in om_user_simplefin_tokens is one connection (access URL). All of a
+user's connections are fetched concurrently and merged into a single account
+set document; a failing or slow connection is reported in
+"connection_errors" without delaying or failing the others.
+
+stream_accounts parses the response bodies incrementally instead, handing
+accounts and transactions to a callback as they arrive, so memory does not
+grow with the length of a user's transaction history.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import List
+
+import httpx
+
+from jsonstream import JsonStream, NEED_INPUT, advance
+from profiling import span
+
+SIMPLEFIN_TIMEOUT = float(os.getenv("SIMPLEFIN_TIMEOUT", "60"))
+# Minimum time between user-triggered syncs, to stay within the bridge quota
+SYNC_COOLDOWN_MINUTES = 15
+
+def accounts_url(access_url: str) -> str:
+    # Ensure the URL ends with /accounts
+    if not access_url.rstrip('/').endswith('/accounts'):
+        return access_url.rstrip('/') + '/accounts'
+    return access_url
+
+def get_connections(get_table, user_id: str) -> List[dict]:
+    """All SimpleFIN connections of a user as [{"id", "access_url"}]"""
+    with span("token_lookup"):
+        resp = get_table("om_user_simplefin_tokens").select("id, simplefin_token, user_id").eq("user_id", user_id).execute()
+    return [
+        {"id": row.get("id"), "access_url": accounts_url(row["simplefin_token"])}
+        for row in resp.data or []
+        if row.get("simplefin_token")
+    ]
+
+async def _fetch_one(client: httpx.AsyncClient, index: int, connection: dict) -> dict:
+    started = time.perf_counter()
+    result = {"id": connection["id"], "status": None, "error": None, "document": None}
+    try:
+        with span(f"simplefin_fetch[{index}]"):
+            response = await client.get(connection["access_url"])
+        result["status"] = response.status_code
+        if response.status_code != 200:
+            result["error"] = response.text
+        else:
+            with span(f"parse[{index}]"):
+                result["document"] = response.json()
+    except Exception as e:
+        logging.warning(f"SimpleFIN connection {connection['id']} failed: {str(e)}")
+        result["error"] = str(e)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+async def fetch_accounts(connections: List[dict], timeout: float = SIMPLEFIN_TIMEOUT) -> dict:
+    """
+    Fetch every connection concurrently and merge the account sets.
+
+    Returns {"errors": [...], "accounts": [...], "connection_errors": [...]}
+    where connection_errors lists the connections that failed with their
+    HTTP status (None on network errors) and message.
+    """
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+        results = await asyncio.gather(*(
+            _fetch_one(client, i, connection) for i, connection in enumerate(connections)
+        ))
+
+    merged = {"errors": [], "accounts": [], "connection_errors": []}
+    for result in results:
+        document = result["document"]
+        if document is None:
+            merged["connection_errors"].append({
+                "connection_id": result["id"],
+                "status": result["status"],
+                "error": result["error"],
+            })
+            continue
+        merged["errors"].extend(document.get("errors") or [])
+        merged["accounts"].extend(document.get("accounts") or [])
+    return merged
+
+def _account_events(stream: JsonStream):
+    account = {}
+    held = []
+    yield from stream.expect('{')
+    if not (yield from stream.empty('}')):
+        while True:
+            key = yield from stream.decode_value()
+            yield from stream.expect(':')
+            if key != "transactions":
+                account[key] = yield from stream.decode_value()
+            elif (yield from stream.next_token()) == '[':
+                yield from stream.expect('[')
+                if not (yield from stream.empty(']')):
+                    while True:
+                        tx = yield from stream.decode_value()
+                        if "id" in account:
+                            yield ("transaction", account, tx)
+                        else:
+                            held.append(tx)
+                        if (yield from stream.expect(',]')) == ']':
+                            break
+            else:
+                yield from stream.decode_value()  # null
+            if (yield from stream.expect(',}')) == '}':
+                break
+    for tx in held:
+        yield ("transaction", account, tx)
+    yield ("account", account)
+
+def _account_set_parser(stream: JsonStream):
+    """
+    Incremental parser for a SimpleFIN account set document (see
+    jsonstream.py for how it is driven). Yields:
+
+      ("error", message)            an entry of the top-level "errors" list
+      ("transaction", account, tx)  one transaction; account holds the account
+                                    fields read so far, "id" included
+      ("account", account)          the account without its transactions,
+                                    once its object is complete
+
+    Transactions that precede their account's "id" are held back until the
+    account object ends.
+    """
+    yield from stream.expect('{')
+    if (yield from stream.empty('}')):
+        return
+    while True:
+        key = yield from stream.decode_value()
+        yield from stream.expect(':')
+        if key == "accounts":
+            yield from stream.expect('[')
+            if not (yield from stream.empty(']')):
+                while True:
+                    yield from _account_events(stream)
+                    if (yield from stream.expect(',]')) == ']':
+                        break
+        else:
+            value = yield from stream.decode_value()
+            if key == "errors":
+                for message in value or []:
+                    yield ("error", message)
+        if (yield from stream.expect(',}')) == '}':
+            return
+
+async def _next_chunk(chunks) -> str:
+    # Next non-empty text chunk, '' at the end of the body
+    async for chunk in chunks:
+        if chunk:
+            return chunk
+    return ''
+
+async def _stream_one(client: httpx.AsyncClient, index: int, connection: dict, on_event) -> dict:
+    started = time.perf_counter()
+    result = {
+        "id": connection["id"], "status": None, "error": None, "error_class": None, "errors": [],
+        "bytes": 0, "accounts": 0, "transactions": 0, "institutions": set()
+    }
+    try:
+        with span(f"simplefin_stream[{index}]"):
+            async with client.stream("GET", connection["access_url"]) as response:
+                result["status"] = response.status_code
+                if response.status_code != 200:
+                    await response.aread()
+                    result["error"] = response.text
+                    result["error_class"] = f"HTTP {response.status_code}"
+                else:
+                    chunks = response.aiter_text()
+                    parser = _account_set_parser(JsonStream("SimpleFIN response"))
+                    event = advance(parser)
+                    while event is not None:
+                        if event is NEED_INPUT:
+                            event = advance(parser, await _next_chunk(chunks))
+                            continue
+                        if event[0] == "error":
+                            result["errors"].append(event[1])
+                        else:
+                            if event[0] == "account":
+                                result["accounts"] += 1
+                                org = event[1].get("org") or {}
+                                if org.get("name"):
+                                    result["institutions"].add(org["name"])
+                            else:
+                                result["transactions"] += 1
+                            await on_event(event)
+                        event = advance(parser)
+                result["bytes"] = response.num_bytes_downloaded
+    except Exception as e:
+        logging.warning(f"SimpleFIN connection {connection['id']} failed: {str(e)}")
+        result["error"] = str(e)
+        result["error_class"] = type(e).__name__
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+async def stream_accounts(connections: List[dict], on_event, timeout: float = SIMPLEFIN_TIMEOUT) -> dict:
+    """
+    Stream every connection concurrently, awaiting on_event(event) for each
+    ("account", ...) and ("transaction", ...) event of _account_set_parser.
+
+    Returns {"errors": [...], "connection_errors": [...], "bytes": n,
+    "connections": [...]} with the same connection_errors as fetch_accounts
+    and, per connection, its timing, volume and institutions for the sync
+    ledger. Events already delivered for a connection that fails part-way
+    are not taken back.
+    """
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+        results = await asyncio.gather(*(
+            _stream_one(client, i, connection, on_event) for i, connection in enumerate(connections)
+        ))
+
+    merged = {"errors": [], "connection_errors": [], "bytes": 0, "connections": []}
+    for result in results:
+        merged["bytes"] += result["bytes"]
+        merged["connections"].append({
+            "connection_id": result["id"],
+            "status": result["status"],
+            "elapsed_ms": result["elapsed_ms"],
+            "bytes": result["bytes"],
+            "accounts": result["accounts"],
+            "transactions": result["transactions"],
+            "institutions": sorted(result["institutions"]),
+            "error_class": result["error_class"],
+        })
+        merged["errors"].extend(result["errors"])
+        if result["error"] is not None:
+            merged["connection_errors"].append({
+                "connection_id": result["id"],
+                "status": result["status"],
+                "error": result["error"],
+                "error_class": result["error_class"],
+            })
+    return merged
+
+def fetch_accounts_blocking(connections: List[dict], timeout: float = SIMPLEFIN_TIMEOUT) -> dict:
+    """fetch_accounts for synchronous endpoints, which run in worker threads without an event loop"""
+    return asyncio.run(fetch_accounts(connections, timeout))
+
+def all_failed(merged: dict, connections: List[dict]) -> bool:
+    return len(merged["connection_errors"]) == len(connections)
@@ -0,0 +1,151 @@
+"""
+Ledger of SimpleFIN sync runs (om_sync_runs).
+
+Every sync writes one row when it finishes, with its timings, volumes,
+outcome and, per connection, the institutions it returned, so slow syncs
+can be traced to users and institutions. fleet_stats summarizes a window
+of runs into percentiles for capacity planning.
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+# Columns summarized by fleet_stats
+TIMED_COLUMNS = ("duration_ms", "fetch_ms", "db_ms", "bytes_received", "transaction_count")
+
+class SyncRun:
+    """
+    Timings and counts of one sync, written by finish().
+
+    fetch_ms is the wall time spent streaming from SimpleFIN less the
+    database writes made while streaming; db_ms is the time spent in
+    database writes, summed, so concurrent writes can exceed the wall time.
+    """
+
+    def __init__(self, user_id: str, trigger: str):
+        self.user_id = user_id
+        self.trigger = trigger
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self.fetch_seconds = 0.0
+        self.db_seconds = 0.0
+        self.connections = []
+        self.connection_count = 0
+        self.failed_connections = 0
+        self.account_count = 0
+        self.transaction_count = 0
+        self.bytes_received = 0
+        self.row = None  # Written by finish
+
+    @contextmanager
+    def db_write(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.db_seconds += time.perf_counter() - started
+
+    def fetched(self, merged: dict, stream_seconds: float, stream_db_seconds: float):
+        """Record the result of simplefin.stream_accounts"""
+        self.fetch_seconds = max(stream_seconds - stream_db_seconds, 0.0)
+        self.db_seconds += stream_db_seconds
+        self.connections = merged["connections"]
+        self.connection_count = len(merged["connections"])
+        self.failed_connections = len(merged["connection_errors"])
+        self.bytes_received = merged["bytes"]
+
+    def finish(self, get_table, outcome: str, error_class: str = None, error_message: str = None) -> dict:
+        """
+        Write the run; outcome is "success", "partial" or "failed". Never
+        raises, a sync must not fail because its ledger row could not be written.
+        Only the first call writes; later ones return the row already written.
+        """
+        if self.row is not None:
+            return self.row
+        self.row = row = {
+            "id": str(uuid.uuid4()),
+            "user_id": self.user_id,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.utcnow().isoformat(),
+            "duration_ms": round((time.perf_counter() - self._started) * 1000),
+            "fetch_ms": round(self.fetch_seconds * 1000),
+            "db_ms": round(self.db_seconds * 1000),
+            "connection_count": self.connection_count,
+            "failed_connections": self.failed_connections,
+            "account_count": self.account_count,
+            "transaction_count": self.transaction_count,
+            "bytes_received": self.bytes_received,
+            "outcome": outcome,
+            "error_class": error_class,
+            "error_message": error_message[:1000] if error_message else None,
+            "connections": self.connections,
+        }
+        try:
+            get_table("om_sync_runs").insert(row).execute()
+        except Exception as e:
+            logging.warning(f"Failed to record sync run for user {self.user_id}: {str(e)}")
+        return row
+
+def _percentiles(values) -> dict:
+    values = np.asarray([v for v in values if v is not None], dtype=np.float64)
+    if values.size == 0:
+        return {f"p{q}": None for q in PERCENTILES}
+    return {f"p{q}": round(float(v), 1) for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+def fleet_stats(runs: List[dict], top: int = 10) -> dict:
+    """
+    Percentiles of TIMED_COLUMNS over all runs, connection latency
+    percentiles per institution, outcome and error class counts, and the
+    slowest runs and users.
+    """
+    outcomes, error_classes = {}, {}
+    by_institution = {}
+    by_user = {}
+    for run in runs:
+        outcomes[run.get("outcome")] = outcomes.get(run.get("outcome"), 0) + 1
+        if run.get("error_class"):
+            error_classes[run["error_class"]] = error_classes.get(run["error_class"], 0) + 1
+        by_user.setdefault(run["user_id"], []).append(run.get("duration_ms"))
+        for connection in run.get("connections") or []:
+            for institution in connection.get("institutions") or ["(unknown)"]:
+                stats = by_institution.setdefault(institution, {"elapsed_ms": [], "bytes": [], "errors": 0})
+                stats["elapsed_ms"].append(connection.get("elapsed_ms"))
+                stats["bytes"].append(connection.get("bytes"))
+                if connection.get("error_class"):
+                    stats["errors"] += 1
+
+    institutions = {
+        name: {
+            "connections": len(stats["elapsed_ms"]),
+            "errors": stats["errors"],
+            "elapsed_ms": _percentiles(stats["elapsed_ms"]),
+            "bytes": _percentiles(stats["bytes"]),
+        }
+        for name, stats in by_institution.items()
+    }
+    users = sorted(
+        ({"user_id": user_id, "runs": len(durations), "duration_ms": _percentiles(durations)}
+         for user_id, durations in by_user.items()),
+        key=lambda u: u["duration_ms"]["p90"] or 0,
+        reverse=True
+    )
+    slowest = sorted(runs, key=lambda r: r.get("duration_ms") or 0, reverse=True)[:top]
+    return {
+        "runs": len(runs),
+        "outcomes": outcomes,
+        "error_classes": error_classes,
+        "percentiles": {column: _percentiles(run.get(column) for run in runs) for column in TIMED_COLUMNS},
+        "institutions": dict(sorted(institutions.items(), key=lambda i: i[1]["elapsed_ms"]["p90"] or 0, reverse=True)),
+        "slowest_users": users[:top],
+        "slowest_runs": [
+            {key: run.get(key) for key in ("id", "user_id", "started_at", "duration_ms", "fetch_ms", "db_ms", "outcome", "connections")}
+            for run in slowest
+        ],
+    }
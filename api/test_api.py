@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("supabase")
+pytest.importorskip("jose")
+pytest.importorskip("httpx")
+
+# The app creates its Supabase client at import; nothing is requested
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test.service.key")
+
+from fastapi import HTTPException
+
+from api.api import decode_cursor, encode_cursor
+
+def test_cursor_round_trips_sort_value_and_tie_breaker():
+    row = {"balance": "12.50", "sf_account_id": "ACT-1", "sf_account_name": "Checking"}
+    assert decode_cursor(encode_cursor(row, "balance")) == ("12.50", "ACT-1")
+
+def test_cursor_keeps_null_sort_values_and_is_url_safe():
+    row = {"sf_account_name": None, "sf_account_id": "ACT/?+=é"}
+    cursor = encode_cursor(row, "sf_account_name")
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+    assert decode_cursor(cursor) == (None, "ACT/?+=é")
+
+@pytest.mark.parametrize("cursor", ["not base64!", "W10=", "eyJhIjogMX0="])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
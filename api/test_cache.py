@@ -0,0 +1,40 @@
+import cache as cache_module
+from cache import Cache, MemoryBackend, SqliteBackend
+
+def test_memory_cache_invalidates_a_user():
+    cache = Cache(MemoryBackend())
+    cache.set("settings", "u1", value={"a": 1}, user_id="u1")
+    cache.set("settings", "u2", value={"a": 2}, user_id="u2")
+    assert cache.invalidate_user("u1") == 1
+    assert cache.get("settings", "u1") is None
+    assert cache.get("settings", "u2") == {"a": 2}
+
+def test_sqlite_cache_uses_its_own_path(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    backend = SqliteBackend(str(path))
+    Cache(backend).set("analytics", "u1", value=[1, 2], user_id="u1")
+    assert path.exists()
+    assert backend.backend_stats()["path"] == str(path)
+
+def test_sqlite_hits_refresh_lru_position_at_most_once_per_interval(tmp_path, monkeypatch):
+    backend = SqliteBackend(str(tmp_path / "cache.sqlite"))
+    backend.set("k", "v", ttl=3600, tags=())
+    conn = backend._connect()
+    used_at = conn.execute("SELECT used_at FROM entries WHERE key = 'k'").fetchone()[0]
+
+    assert backend.get("k") == "v"
+    assert conn.execute("SELECT used_at FROM entries WHERE key = 'k'").fetchone()[0] == used_at
+
+    monkeypatch.setattr(cache_module.time, "time", lambda: used_at + cache_module.SQLITE_TOUCH_SECONDS)
+    assert backend.get("k") == "v"
+    assert conn.execute("SELECT used_at FROM entries WHERE key = 'k'").fetchone()[0] > used_at
+
+def test_sqlite_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(cache_module.time, "time", lambda: next(clock))
+    backend = SqliteBackend(str(tmp_path / "cache.sqlite"), max_entries=2)
+    backend.set("a", "1", ttl=3600, tags=("user:u1",))
+    backend.set("b", "2", ttl=3600, tags=())
+    backend.set("c", "3", ttl=3600, tags=())
+    assert backend.backend_stats()["entries"] == 2
+    assert backend.invalidate_tag("user:u1") == 0
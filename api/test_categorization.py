@@ -0,0 +1,108 @@
+import random
+import re
+
+from categorization import compile_rules
+
+def categories(*entries):
+    return {"transaction_categories": [{"name": name, "rules": rules} for name, rules in entries]}
+
+def reference_categorize(document, transactions):
+    """Every rule tested separately, in the documented precedence"""
+    rules = []
+    for category in document["transaction_categories"]:
+        for rule in category["rules"]:
+            rules.append(dict(rule, category=category["name"]))
+    ordered = [r for r in rules if r.get("account_id")] + [r for r in rules if not r.get("account_id")]
+    results = []
+    for tx in transactions:
+        text = " ".join(filter(None, (tx.get("payee"), tx.get("description")))).lower()
+        amount = float(tx["amount"])
+        category = None
+        for r in ordered:
+            if r.get("account_id") and r["account_id"] != tx.get("sf_account_id"):
+                continue
+            if r["match"] == "payee" and r["pattern"].lower() not in text:
+                continue
+            if r["match"] == "regex" and not re.search(r["pattern"], text, re.IGNORECASE):
+                continue
+            if r.get("min") is not None and amount < r["min"]:
+                continue
+            if r.get("max") is not None and amount > r["max"]:
+                continue
+            category = r["category"]
+            break
+        results.append(category)
+    return results
+
+def test_first_matching_category_wins():
+    rules = compile_rules(categories(
+        ("Coffee", [{"match": "payee", "pattern": "starbucks"}]),
+        ("Food", [{"match": "payee", "pattern": "star"}]),
+    ))
+    assert rules.categorize([
+        {"description": "STARBUCKS #12", "amount": "-4.50"},
+        {"description": "Star Market", "amount": "-30"},
+        {"description": "Shell", "amount": "-40"},
+    ]) == ["Coffee", "Food", None]
+
+def test_account_scoped_rules_win_over_global_rules():
+    rules = compile_rules(categories(
+        ("Food", [{"match": "payee", "pattern": "costco"}]),
+        ("Fuel", [{"match": "payee", "pattern": "costco", "account_id": "CARD"}]),
+    ))
+    assert rules.categorize([
+        {"description": "COSTCO GAS", "amount": "-50", "sf_account_id": "CARD"},
+        {"description": "COSTCO GAS", "amount": "-50", "sf_account_id": "CHK"},
+    ]) == ["Fuel", "Food"]
+
+def test_amount_bounds_apply_to_every_rule_kind():
+    rules = compile_rules(categories(
+        ("Coffee", [{"match": "regex", "pattern": "^sq \\*", "max": 0, "min": -10}]),
+        ("Refunds", [{"match": "amount", "min": 0}]),
+    ))
+    assert rules.categorize([
+        {"description": "SQ *BLUE BOTTLE", "amount": "-6"},
+        {"description": "SQ *FURNITURE", "amount": "-600"},
+        {"description": "SQ *BLUE BOTTLE", "amount": "6"},
+        {"description": "SQ *BLUE BOTTLE", "amount": None},
+    ]) == ["Coffee", None, "Refunds", None]
+
+def test_overlapping_payee_patterns_all_match():
+    # "coffee" sits inside the longer "coffee bean" match at the same position
+    rules = compile_rules(categories(
+        ("Beans", [{"match": "payee", "pattern": "coffee bean", "min": 0}]),
+        ("Coffee", [{"match": "payee", "pattern": "coffee"}]),
+    ))
+    assert rules.categorize([{"description": "The Coffee Bean", "amount": "-5"}]) == ["Coffee"]
+
+def test_compiled_rules_match_reference_on_many_rules():
+    rng = random.Random(7)
+    words = ["coffee", "cof", "market", "mart", "fuel", "grill", "air", "airline", "hotel", "taxi"]
+    entries = []
+    for i in range(60):
+        rules = []
+        for _ in range(5):
+            kind = rng.choice(["payee", "payee", "regex", "amount"])
+            rule = {"match": kind}
+            if kind == "payee":
+                rule["pattern"] = rng.choice(words) + rng.choice(["", str(rng.randrange(20))])
+            elif kind == "regex":
+                rule["pattern"] = f"^pos {rng.choice(words)}"
+            if rng.random() < 0.3:
+                rule["min"] = -rng.randrange(100)
+            if kind == "amount" or rng.random() < 0.3:
+                rule["max"] = -rng.randrange(100) if rng.random() < 0.5 else 0
+            if rng.random() < 0.1:
+                rule["account_id"] = rng.choice(["A", "B"])
+            rules.append(rule)
+        entries.append((f"C{i}", rules))
+    document = categories(*entries)
+    transactions = [
+        {
+            "description": f"POS {rng.choice(words)}{rng.randrange(30)} {rng.choice(words)}",
+            "amount": f"{rng.uniform(-120, 20):.2f}",
+            "sf_account_id": rng.choice(["A", "B", "C"]),
+        }
+        for _ in range(2000)
+    ]
+    assert compile_rules(document).categorize(transactions) == reference_categorize(document, transactions)
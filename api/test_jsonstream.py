@@ -0,0 +1,50 @@
+import pytest
+
+from jsonstream import JsonStream, iter_events
+
+DOCUMENT = '{"a": [12.5, -3e2, true, null, "x,]}"], "b": {"c": 0}, "d": 1234567}'
+
+def pairs(stream: JsonStream):
+    # Yields (key, value) for each member of a top-level object
+    yield from stream.expect('{')
+    if (yield from stream.empty('}')):
+        return
+    while True:
+        key = yield from stream.decode_value()
+        yield from stream.expect(':')
+        yield (key, (yield from stream.decode_value()))
+        if (yield from stream.expect(',}')) == '}':
+            return
+
+def chunked(text: str, size: int):
+    chunks = iter([text[i:i + size] for i in range(0, len(text), size)])
+    return lambda: next(chunks, '')
+
+def test_every_chunk_size_gives_the_same_values():
+    expected = [("a", [12.5, -300.0, True, None, "x,]}"]), ("b", {"c": 0}), ("d", 1234567)]
+    for size in range(1, len(DOCUMENT) + 1):
+        assert list(iter_events(pairs(JsonStream()), chunked(DOCUMENT, size))) == expected, size
+
+def test_number_split_across_chunks_is_not_cut_short():
+    chunks = iter(['{"n": 12', '.', '5', '}'])
+    assert list(iter_events(pairs(JsonStream()), lambda: next(chunks, ''))) == [("n", 12.5)]
+
+def test_number_at_end_of_input_is_complete():
+    parser = JsonStream().decode_value()
+    next(parser)
+    for chunk in ('4', '2', ''):
+        try:
+            parser.send(chunk)
+        except StopIteration as done:
+            assert done.value == 42
+            break
+    else:
+        pytest.fail("parser did not finish")
+
+def test_malformed_input_names_the_document():
+    with pytest.raises(ValueError, match="Malformed export"):
+        list(iter_events(pairs(JsonStream("export")), chunked('{"a" 1}', 3)))
+
+def test_truncated_input_raises():
+    with pytest.raises(ValueError):
+        list(iter_events(pairs(JsonStream()), chunked('{"a": [1, 2', 4)))
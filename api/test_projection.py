@@ -0,0 +1,33 @@
+import pytest
+
+from projection import parse_fields, project_accounts
+
+DOCUMENT = {
+    "errors": ["one connection is slow"],
+    "accounts": [
+        {"id": "A1", "name": "Checking", "org": {"name": "Bank", "url": "b.example"}, "transactions": [{"id": "t1"}]},
+        {"id": "A2", "name": "Card"},
+    ],
+}
+
+def test_empty_segments_and_paths_are_dropped():
+    assert parse_fields("id,,.,org..name, ") == [("id",), ("org", "name")]
+    assert parse_fields("") is None
+
+@pytest.mark.parametrize("fields", [",", ".", " , . ,"])
+def test_spec_naming_no_fields_is_rejected(fields):
+    with pytest.raises(ValueError):
+        parse_fields(fields)
+
+def test_projection_keeps_requested_paths_and_top_level_keys():
+    projected = project_accounts(DOCUMENT, "id,org.name,missing.path")
+    assert projected == {
+        "errors": ["one connection is slow"],
+        "accounts": [{"id": "A1", "org": {"name": "Bank"}}, {"id": "A2"}],
+    }
+
+def test_compact_mode_drops_transactions_even_when_requested():
+    assert project_accounts(DOCUMENT, "id,transactions", include_transactions=False)["accounts"] == [
+        {"id": "A1"}, {"id": "A2"},
+    ]
+    assert "transactions" not in project_accounts(DOCUMENT, include_transactions=False)["accounts"][0]
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("supabase")
+pytest.importorskip("jose")
+
+# The router creates its Supabase client at import; nothing is requested
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test.service.key")
+
+from routers.settings import merge_patch, patch_categories
+
+def test_merge_patch_merges_objects_and_null_deletes():
+    target = {"a": 1, "b": {"c": 2, "d": 3}, "e": [1, 2]}
+    patch = {"a": None, "b": {"c": 4}, "e": [3], "f": {"g": None}}
+    assert merge_patch(target, patch) == {"b": {"c": 4, "d": 3}, "e": [3], "f": {}}
+    assert target == {"a": 1, "b": {"c": 2, "d": 3}, "e": [1, 2]}
+
+def test_merge_patch_with_a_non_object_replaces():
+    assert merge_patch({"a": 1}, ["x"]) == ["x"]
+    assert merge_patch("text", {"a": 1}) == {"a": 1}
+
+def test_patch_categories_normalizes_only_the_lists_named():
+    # A stored entry a lenient read would leave out survives an unrelated patch
+    stored = {
+        "account_categories": [{"name": "Checking", "color": "green.500"}, {"name": ""}],
+        "transaction_categories": [{"name": "Food", "color": "green.500"}],
+    }
+    patched = patch_categories(stored, {"transaction_categories": [{"name": " Fuel "}]})
+    assert patched["account_categories"] == stored["account_categories"]
+    assert patched["transaction_categories"] == [{"name": "Fuel", "color": "gray.500"}]
+
+def test_patch_categories_rejects_invalid_entries():
+    with pytest.raises(ValueError, match=r"transaction_categories\[1\]"):
+        patch_categories({}, {"transaction_categories": [{"name": "Food"}, {"name": "Food"}]})
@@ -0,0 +1,81 @@
+from transfers import TRANSFER_WINDOW_DAYS, flag_duplicates, link_transfers
+
+DAY = 86400
+
+def row(account, tx_id, amount, posted, transacted_at=None, description="Transfer"):
+    return {
+        "sf_account_id": account,
+        "sf_transaction_id": tx_id,
+        "amount": amount,
+        "posted": posted,
+        "transacted_at": transacted_at,
+        "description": description,
+    }
+
+def test_transfer_links_outflow_and_inflow_in_other_account():
+    rows = [row("chk", "t1", "-250.00", 10 * DAY), row("sav", "t2", "250.00", 11 * DAY)]
+    assert link_transfers(rows) == 1
+    assert all(r["is_transfer"] for r in rows)
+    assert rows[0]["transfer_id"] == rows[1]["transfer_id"] == "chk:t1"
+
+def test_transfer_needs_another_account_and_the_window():
+    rows = [
+        row("chk", "t1", "-40", 10 * DAY),
+        row("chk", "t2", "40", 10 * DAY),
+        row("card", "t3", "-75", 10 * DAY),
+        row("chk", "t4", "75", (10 + TRANSFER_WINDOW_DAYS + 1) * DAY),
+    ]
+    assert link_transfers(rows) == 0
+    assert not any(r["is_transfer"] for r in rows)
+
+def test_transfer_matches_oldest_open_row_once():
+    rows = [
+        row("chk", "t1", "-100", 10 * DAY),
+        row("chk", "t2", "-100", 11 * DAY),
+        row("sav", "t3", "100", 12 * DAY),
+    ]
+    assert link_transfers(rows) == 1
+    assert [r["is_transfer"] for r in rows] == [True, False, True]
+
+def test_pending_rows_are_never_linked():
+    rows = [row("chk", "p1", "-20", 0, transacted_at=5 * DAY), row("sav", "p2", "20", 0, transacted_at=5 * DAY)]
+    assert link_transfers(rows) == 0
+    assert not any(r["is_transfer"] for r in rows)
+
+def test_duplicates_are_not_linked():
+    rows = [
+        row("chk", "t1", "-60", 10 * DAY, transacted_at=9 * DAY),
+        row("chk", "t1-2", "-60", 10 * DAY, transacted_at=9 * DAY),
+        row("sav", "t3", "60", 10 * DAY),
+    ]
+    assert flag_duplicates(rows) == 1
+    assert link_transfers(rows) == 1
+    assert rows[1]["duplicate_of"] == "t1" and not rows[1]["is_transfer"]
+
+def test_pending_row_replaced_by_its_posted_row_is_a_duplicate():
+    rows = [
+        row("chk", "p1", "-9.99", 0, transacted_at=3 * DAY + 120),
+        row("chk", "t1", "-9.99", 4 * DAY, transacted_at=3 * DAY + 120),
+    ]
+    assert flag_duplicates(rows) == 1
+    assert rows[0]["duplicate_of"] == "t1"
+    assert rows[1]["duplicate_of"] is None
+
+def test_lookalike_rows_with_unrelated_ids_are_only_candidates():
+    # Two coffees at the same shop, same time and amount
+    rows = [
+        row("card", "a91", "-4.50", 2 * DAY, transacted_at=DAY, description="Blue Bottle"),
+        row("card", "b17", "-4.50", 2 * DAY, transacted_at=DAY, description="BLUE BOTTLE "),
+    ]
+    assert flag_duplicates(rows) == 0
+    assert rows[1]["duplicate_of"] is None
+    assert rows[1]["duplicate_candidate_of"] == "a91"
+
+def test_flags_are_cleared_when_rows_no_longer_match():
+    rows = [row("chk", "t1", "-5", DAY), row("sav", "t2", "5", DAY)]
+    rows[0].update(duplicate_of="old", duplicate_candidate_of="old", transfer_id="x", is_transfer=True)
+    rows[1]["amount"] = "6"
+    flag_duplicates(rows)
+    link_transfers(rows)
+    assert rows[0]["duplicate_of"] is None and rows[0]["duplicate_candidate_of"] is None
+    assert rows[0]["transfer_id"] is None and not rows[0]["is_transfer"]
@@ -0,0 +1,143 @@
+"""
+Inter-account transfer and duplicate detection for ingested transactions.
+
+Works on the transaction rows built during sync (see routers/sync.py) and
+annotates them in place with link metadata:
+
+- duplicate_of: sf_transaction_id of the copy a row verifiably repeats;
+  analytics leaves these rows out
+- duplicate_candidate_of: sf_transaction_id of an earlier row that merely
+  looks the same; kept in analytics, since genuine repeated purchases
+  (two coffees at the same shop on the same day) look exactly like this
+- transfer_id / is_transfer: set on both sides of a matched pair, an outflow
+  in one account and an equal inflow in another within the date window
+
+Only the rows of the current sync are compared. A copy re-delivered in a
+later sync, after the original has dropped out of SimpleFIN's date range,
+is not detected.
+"""
+import re
+from collections import deque
+from itertools import groupby
+from typing import List
+
+# Maximum days between the two sides of a transfer
+TRANSFER_WINDOW_DAYS = 4
+
+def _cents(value) -> int:
+    try:
+        return round(float(value) * 100)
+    except (TypeError, ValueError):
+        return 0
+
+# Separators before the suffix some institutions append to a re-delivered id
+_ID_SUFFIX = re.compile(r"[-_:.][^-_:.]*$")
+
+def _id_stem(tx_id: str) -> str:
+    return _ID_SUFFIX.sub("", tx_id or "")
+
+def flag_duplicates(rows: List[dict]) -> int:
+    """
+    Flag rows that repeat another row of the same account. Returns the
+    number of rows set in duplicate_of.
+
+    A row is a duplicate only when that is verifiable:
+
+    - a pending row whose posted replacement, with the same transaction
+      time and amount, arrived in the same sync and is the only match
+    - a posted row with the same transaction time to the second, amount
+      and description as an earlier row whose id has the same stem, the id
+      up to its last separator
+
+    Any other row with the same posted and transaction time, amount and
+    description as an earlier one only gets duplicate_candidate_of.
+    """
+    for row in rows:
+        row["duplicate_of"] = None
+        row["duplicate_candidate_of"] = None
+
+    posted_by_time = {}
+    for row in rows:
+        if row.get("posted") and row.get("transacted_at"):
+            key = (row.get("sf_account_id"), row["transacted_at"], _cents(row.get("amount")))
+            posted_by_time.setdefault(key, []).append(row)
+
+    flagged = 0
+    first_seen = {}
+    for row in rows:
+        if not row.get("posted"):
+            if row.get("transacted_at"):
+                matches = posted_by_time.get((row.get("sf_account_id"), row["transacted_at"], _cents(row.get("amount"))), [])
+                if len(matches) == 1:
+                    row["duplicate_of"] = matches[0]["sf_transaction_id"]
+                    flagged += 1
+            continue
+        key = (
+            row.get("sf_account_id"),
+            row.get("posted"),
+            row.get("transacted_at"),
+            _cents(row.get("amount")),
+            (row.get("description") or "").strip().lower(),
+        )
+        original = first_seen.setdefault(key, row["sf_transaction_id"])
+        if original == row["sf_transaction_id"]:
+            continue
+        if row.get("transacted_at") and _id_stem(original) == _id_stem(row["sf_transaction_id"]):
+            row["duplicate_of"] = original
+            flagged += 1
+        else:
+            row["duplicate_candidate_of"] = original
+    return flagged
+
+def link_transfers(rows: List[dict], window_days: int = TRANSFER_WINDOW_DAYS) -> int:
+    """
+    Match opposite-signed, equal-amount transactions across accounts.
+
+    Rows are sorted by (absolute amount, posted) once, then each equal-amount
+    run is swept in date order keeping the unmatched outflows and inflows
+    that are still inside the window. Each row is matched against the
+    oldest open row of the opposite sign in another account, so the cost is
+    O(n log n) instead of comparing every pair.
+
+    Pending rows (posted = 0) are never linked: they have no posted date to
+    window on and are replaced by their posted row once they clear.
+    """
+    window = window_days * 86400
+    for row in rows:
+        row["transfer_id"] = None
+        row["is_transfer"] = False
+
+    candidates = [
+        (abs(_cents(row.get("amount"))), row.get("posted") or 0, i)
+        for i, row in enumerate(rows)
+        if row.get("posted") and not row.get("duplicate_of") and _cents(row.get("amount")) != 0
+    ]
+    candidates.sort()
+
+    linked = 0
+    for _, run in groupby(candidates, key=lambda c: c[0]):
+        open_rows = {True: deque(), False: deque()}  # is_outflow -> [(posted, index)] in date order
+        for _, posted, i in run:
+            row = rows[i]
+            is_outflow = _cents(row.get("amount")) < 0
+            opposite = open_rows[not is_outflow]
+            # Drop rows that fell out of the window
+            while opposite and posted - opposite[0][0] > window:
+                opposite.popleft()
+            match = next(
+                (k for k, (_, j) in enumerate(opposite) if rows[j].get("sf_account_id") != row.get("sf_account_id")),
+                None
+            )
+            if match is None:
+                open_rows[is_outflow].append((posted, i))
+                continue
+            _, j = opposite[match]
+            del opposite[match]
+            outflow, inflow = (row, rows[j]) if is_outflow else (rows[j], row)
+            # Deterministic, so re-syncing the same pair rewrites the same link
+            transfer_id = f"{outflow['sf_account_id']}:{outflow['sf_transaction_id']}"
+            for side in (outflow, inflow):
+                side["transfer_id"] = transfer_id
+                side["is_transfer"] = True
+            linked += 1
+    return linked
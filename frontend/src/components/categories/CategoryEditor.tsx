@@ -41,7 +41,7 @@ import {
   SimpleGrid
 } from '@chakra-ui/react'
 import { useAuth } from '../../contexts/AuthContext'
-import { supabase } from '../../lib/supabase'
+import axios from 'axios'
 import { useState } from 'react'
 import { AddIcon, DeleteIcon, EditIcon } from '@chakra-ui/icons'
 
@@ -78,7 +78,7 @@ interface CategoryEditorProps {
 }
 
 const CategoryEditor = ({ categories, onCategoriesChange }: CategoryEditorProps) => {
-  const { user } = useAuth()
+  const { user, session } = useAuth()
   const toast = useToast()
   const [categoryType, setCategoryType] = useState<CategoryType>('account')
   const [editingCategory, setEditingCategory] = useState<Category | null>(null)
@@ -86,6 +86,16 @@ const CategoryEditor = ({ categories, onCategoriesChange }: CategoryEditorProps)
   const [newCategory, setNewCategory] = useState<Category>({ name: '', color: 'blue.500' })
   const [parentCategory, setParentCategory] = useState<string | null>(null)
 
+  // Only the list being edited is sent; the server validates and normalizes it
+  const saveCategories = async (updatedCategories: CategoryStructure) => {
+    const list = categoryType === 'account' ? 'account_categories' : 'transaction_categories';
+    await axios.patch('/api/v1/settings', { categories: { [list]: updatedCategories[list] } }, {
+      headers: {
+        Authorization: `Bearer ${session?.access_token}`
+      }
+    });
+  };
+
   const boxBg = useColorModeValue('white', 'gray.800')
   const textColor = useColorModeValue('gray.600', 'gray.300')
   const borderColor = useColorModeValue('gray.200', 'gray.600')
@@ -203,15 +213,7 @@ const CategoryEditor = ({ categories, onCategoriesChange }: CategoryEditorProps)
     }
 
     try {
-      const { error } = await supabase
-        .from('om_user_settings')
-        .update({
-          categories: updatedCategories,
-          updated_at: new Date().toISOString()
-        })
-        .eq('id', user.id);
-
-      if (error) throw error;
+      await saveCategories(updatedCategories);
 
       onCategoriesChange(updatedCategories);
       setNewCategory({ name: '', color: 'blue.500' });
@@ -226,7 +228,7 @@ const CategoryEditor = ({ categories, onCategoriesChange }: CategoryEditorProps)
     } catch (error: any) {
       toast({
         title: 'Error adding category',
-        description: error.message,
+        description: error.response?.data?.detail || error.message,
         status: 'error',
         duration: 5000,
       });
@@ -377,15 +379,7 @@ const CategoryEditor = ({ categories, onCategoriesChange }: CategoryEditorProps)
     }
 
     try {
-      const { error } = await supabase
-        .from('om_user_settings')
-        .update({
-          categories: updatedCategories,
-          updated_at: new Date().toISOString()
-        })
-        .eq('id', user.id);
-
-      if (error) throw error;
+      await saveCategories(updatedCategories);
 
       onCategoriesChange(updatedCategories);
       setEditingCategory(null);
@@ -401,7 +395,7 @@ const CategoryEditor = ({ categories, onCategoriesChange }: CategoryEditorProps)
     } catch (error: any) {
       toast({
         title: 'Error updating category',
-        description: error.message,
+        description: error.response?.data?.detail || error.message,
         status: 'error',
         duration: 5000,
       });
@@ -437,15 +431,7 @@ const CategoryEditor = ({ categories, onCategoriesChange }: CategoryEditorProps)
     }
 
     try {
-      const { error } = await supabase
-        .from('om_user_settings')
-        .update({
-          categories: updatedCategories,
-          updated_at: new Date().toISOString()
-        })
-        .eq('id', user.id);
-
-      if (error) throw error;
+      await saveCategories(updatedCategories);
 
       onCategoriesChange(updatedCategories);
       toast({
@@ -456,7 +442,7 @@ const CategoryEditor = ({ categories, onCategoriesChange }: CategoryEditorProps)
     } catch (error: any) {
       toast({
         title: 'Error deleting category',
-        description: error.message,
+        description: error.response?.data?.detail || error.message,
         status: 'error',
         duration: 5000,
       });
@@ -1,24 +1,32 @@
 import { createContext, useContext, useEffect } from 'react'
 import { useColorMode } from '@chakra-ui/react'
-import { supabase } from '../lib/supabase'
+import axios from 'axios'
 import { useAuth } from './AuthContext'
 
 const ColorModeContext = createContext<null>(null)
 
 export const ColorModeProvider = ({ children }: { children: React.ReactNode }) => {
   const { colorMode, setColorMode } = useColorMode()
-  const { user } = useAuth()
+  const { user, session } = useAuth()
 
   useEffect(() => {
-    const initializeColorMode = async () => {
-      if (!user) return
+    // Settings are read through the API, like every other settings access
+    const fetchDarkMode = async () => {
+      const response = await axios.get('/api/v1/settings', {
+        headers: {
+          Authorization: `Bearer ${session?.access_token}`
+        }
+      })
+      return response.data as { dark_mode: boolean | null }
+    }
 
-      const { data, error } = await supabase
-        .from('om_user_settings')
-        .select('dark_mode')
-        .single()
+    const initializeColorMode = async () => {
+      if (!user || !session) return
 
-      if (error && error.code !== 'PGRST116') {
+      let data
+      try {
+        data = await fetchDarkMode()
+      } catch (error) {
         console.error('Error fetching color mode:', error)
         return
       }
@@ -39,10 +47,8 @@ export const ColorModeProvider = ({ children }: { children: React.ReactNode }) =
     // Listen for system color scheme changes
     const mediaQuery = window.matchMedia('(prefers-color-scheme: dark)')
     const handleChange = async () => {
-      const { data } = await supabase
-        .from('om_user_settings')
-        .select('dark_mode')
-        .single()
+      if (!user || !session) return
+      const data = await fetchDarkMode().catch(() => null)
 
       if (data?.dark_mode === null) {
         setColorMode(mediaQuery.matches ? 'dark' : 'light')
@@ -51,7 +57,7 @@ export const ColorModeProvider = ({ children }: { children: React.ReactNode }) =
 
     mediaQuery.addEventListener('change', handleChange)
     return () => mediaQuery.removeEventListener('change', handleChange)
-  }, [user, setColorMode])
+  }, [user, session, setColorMode])
 
   return (
     <ColorModeContext.Provider value={null}>
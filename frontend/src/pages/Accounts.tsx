@@ -112,14 +112,13 @@ const Accounts = () => {
     queryFn: async () => {
       if (!session?.access_token || !user) return null;
       
-      const { data, error } = await supabase
-        .from('om_user_settings')
-        .select('*')
-        .eq('id', user.id)
-        .single();
-        
-      if (error) throw error;
-      return data;
+      // Same query key as the dashboard, so the same normalized shape
+      const response = await axios.get('/api/v1/settings', {
+        headers: {
+          Authorization: `Bearer ${session.access_token}`
+        }
+      });
+      return response.data;
     },
     enabled: !!user && !!session?.access_token,
     staleTime: 5 * 60 * 1000,
@@ -24,7 +24,6 @@ import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import axios from 'axios'
 import { useAuth } from '../contexts/AuthContext'
 import { useState, useEffect } from 'react'
-import { supabase } from '../lib/supabase'
 import CategoryPieChart from '../components/CategoryPieChart'
 import { CategoryStructure } from '../components/CategoryManager'
 import CurrencyDisplay, { formatCurrency } from '../components/CurrencyDisplay'
@@ -48,12 +47,19 @@ interface UserSettings {
   categories?: CategoryStructure;
 }
 
-const fetchUserAccounts = async (jwt: string): Promise<Account[]> => {
+// How long to wait before re-reading accounts the server is refreshing
+const ACCOUNTS_REFRESH_POLL_MS = 5000;
+
+const fetchUserAccounts = async (jwt: string, onRefreshing?: () => void): Promise<Account[]> => {
   const response = await axios.get('/api/v1/user_accounts', {
     headers: {
       Authorization: `Bearer ${jwt}`
     }
   });
+  // Stale or first-load data: the server is refreshing from SimpleFIN in the background
+  if (response.data.refreshing && onRefreshing) {
+    setTimeout(onRefreshing, ACCOUNTS_REFRESH_POLL_MS);
+  }
   return response.data.accounts || [];
 };
 
@@ -78,7 +84,9 @@ const Dashboard = () => {
   // Fetch user accounts
   const { data: accounts = [], isLoading: loadingAccounts } = useQuery<Account[]>({
     queryKey: ['userAccounts', userId],
-    queryFn: () => jwt ? fetchUserAccounts(jwt) : Promise.resolve([]),
+    queryFn: () => jwt
+      ? fetchUserAccounts(jwt, () => queryClient.invalidateQueries({ queryKey: ['userAccounts', userId] }))
+      : Promise.resolve([]),
     enabled: !!userId && !!jwt,
     staleTime: 5 * 60 * 1000, // Data considered fresh for 5 minutes
     refetchOnWindowFocus: false, // Prevent refetch when window gets focus
@@ -90,30 +98,13 @@ const Dashboard = () => {
     queryKey: ['userSettings', userId],
     queryFn: async () => {
       if (!session?.access_token || !user) return { id: '', dark_mode: null };
-      
-      const { data, error } = await supabase
-        .from('om_user_settings')
-        .select('*')
-        .eq('id', user.id)
-        .single();
-        
-      if (error) throw error;
-      
-      // Ensure we have a valid categories structure
-      if (!data.categories || typeof data.categories !== 'object') {
-        data.categories = {
-          account_categories: [],
-          transaction_categories: []
-        };
-      } else if (Array.isArray(data.categories)) {
-        // Handle legacy format
-        data.categories = {
-          account_categories: data.categories,
-          transaction_categories: []
-        };
-      }
-      
-      return data;
+      // Categories come back already normalized by the server
+      const response = await axios.get('/api/v1/settings', {
+        headers: {
+          Authorization: `Bearer ${session.access_token}`
+        }
+      });
+      return response.data;
     },
     enabled: !!user && !!session?.access_token,
     staleTime: 5 * 60 * 1000,
@@ -149,9 +140,14 @@ const Dashboard = () => {
       }
       try {
         // Use sync endpoint instead of accounts endpoint
+        // Only the sync status is used here, so skip the account payload
         const response = await axios.get('/api/v1/sync/', {
           headers: {
             Authorization: `Bearer ${jwt}`
+          },
+          params: {
+            fields: 'id',
+            include_transactions: false
           }
         });
         
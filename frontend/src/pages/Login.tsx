@@ -3,13 +3,16 @@ import { Box, Button, FormControl, FormLabel, Input, VStack, Text, useToast, Hea
 import { useNavigate } from 'react-router-dom'
 import { useAuth } from '../contexts/AuthContext'
 import axios from 'axios'
+import { useQueryClient } from '@tanstack/react-query'
+import { supabase } from '../lib/supabase'
 
 const Login = () => {
   const [email, setEmail] = useState('')
   const [password, setPassword] = useState('')
   const [isSignUp, setIsSignUp] = useState(false)
   const [loading, setLoading] = useState(false)
-  const { signIn, signUp, session } = useAuth()
+  const { signIn, signUp } = useAuth()
+  const queryClient = useQueryClient()
   const navigate = useNavigate()
   const toast = useToast()
 
@@ -31,18 +34,27 @@ const Login = () => {
       } else {
         await signIn(email, password)
         
-        // Fetch accounts data from API after successful login
+        // Load startup data in one call (no SimpleFIN fetch) and seed the
+        // dashboard's queries with it
         try {
-          if (session?.access_token) {
-            await axios.get('/api/v1/accounts', {
+          const { data: { session: newSession } } = await supabase.auth.getSession()
+          if (newSession?.access_token) {
+            const { data } = await axios.get('/api/v1/bootstrap', {
               headers: {
-                Authorization: `Bearer ${session.access_token}`
+                Authorization: `Bearer ${newSession.access_token}`
               }
             })
+            // While the server refreshes stale accounts, seed them as already
+            // stale so the dashboard revalidates and polls as usual
+            queryClient.setQueryData(['userAccounts', data.user.id], data.accounts,
+              data.sync.refreshing ? { updatedAt: 0 } : undefined)
+            if (data.settings) {
+              queryClient.setQueryData(['userSettings', data.user.id], { id: data.user.id, ...data.settings })
+            }
           }
         } catch (apiError) {
-          console.error('Failed to fetch accounts:', apiError)
-          // Continue with navigation even if accounts fetch fails
+          console.error('Failed to load bootstrap data:', apiError)
+          // Continue with navigation; the dashboard loads its own data
         }
         
         navigate('/')
@@ -10,7 +10,8 @@ import {
   useColorModeValue
 } from '@chakra-ui/react'
 import { useAuth } from '../contexts/AuthContext'
-import { supabase } from '../lib/supabase'
+import axios from 'axios'
+import { useQueryClient } from '@tanstack/react-query'
 import { useEffect, useState } from 'react'
 import CategoryEditor from '../components/categories/CategoryEditor'
 
@@ -37,6 +38,7 @@ const Settings = () => {
   const { colorMode, setColorMode } = useColorMode()
   const { user, session, signOut } = useAuth()
   const toast = useToast()
+  const queryClient = useQueryClient()
   const [settings, setSettings] = useState<UserSettings | null>(null)
   const [colorModeSetting, setColorModeSetting] = useState<ColorModeSetting>('system')
   const [categories, setCategories] = useState<CategoryStructure>({
@@ -54,110 +56,23 @@ const Settings = () => {
       if (!user || !session) return;
 
       try {
-        const { data, error } = await supabase
-          .from('om_user_settings')
-          .select('*')
-          .eq('id', user.id)
-          .single()
-
-        if (error && error.code !== 'PGRST116') {
-          throw error;
-        } 
-        
-        if (data) {
-          setSettings(data)
-          setColorModeSetting(data.dark_mode === null ? 'system' : data.dark_mode ? 'dark' : 'light')
-          
-          // Handle the new categories structure
-          if (data.categories) {
-            if (typeof data.categories === 'object' && 
-                'account_categories' in data.categories && 
-                'transaction_categories' in data.categories) {
-              // New structure already exists
-              setCategories(data.categories as CategoryStructure);
-            } else if (Array.isArray(data.categories)) {
-              // Old structure, convert to new
-              setCategories({
-                account_categories: data.categories as Category[],
-                transaction_categories: []
-              });
-            } else {
-              // Initialize empty structure
-              setCategories({
-                account_categories: [],
-                transaction_categories: []
-              });
-            }
-          } else {
-            // Initialize with default categories
-            const defaultCategories: CategoryStructure = {
-              account_categories: [
-                { name: "Checking", color: "green.500" },
-                { name: "Savings", color: "blue.500" },
-                { name: "Investment", color: "purple.500" },
-                { name: "Credit Card", color: "red.500" }
-              ],
-              transaction_categories: [
-                { name: "Food", color: "green.500" },
-                { name: "Bills", color: "red.500" },
-                { name: "Transportation", color: "blue.500" },
-                { name: "Entertainment", color: "purple.500" }
-              ]
-            };
-            
-            setCategories(defaultCategories);
-            
-            // Save default categories
-            const { error: upsertError } = await supabase
-              .from('om_user_settings')
-              .upsert({
-                id: user.id,
-                dark_mode: data?.dark_mode ?? null,
-                categories: defaultCategories,
-                updated_at: new Date().toISOString()
-              })
-              
-            if (upsertError) throw upsertError;
+        // Categories come back already normalized by the server, with the
+        // defaults for users who never saved any
+        const response = await axios.get('/api/v1/settings', {
+          headers: {
+            Authorization: `Bearer ${session.access_token}`
           }
-        } else {
-          // Create default settings if none exist
-          const defaultCategories: CategoryStructure = {
-            account_categories: [
-              { name: "Checking", color: "green.500" },
-              { name: "Savings", color: "blue.500" },
-              { name: "Investment", color: "purple.500" },
-              { name: "Credit Card", color: "red.500" }
-            ],
-            transaction_categories: [
-              { name: "Food", color: "green.500" },
-              { name: "Bills", color: "red.500" },
-              { name: "Transportation", color: "blue.500" },
-              { name: "Entertainment", color: "purple.500" }
-            ]
-          };
-          
-          const { error: upsertError } = await supabase
-            .from('om_user_settings')
-            .upsert({
-              id: user.id,
-              dark_mode: null,
-              categories: defaultCategories,
-              updated_at: new Date().toISOString()
-            })
-            
-          if (upsertError) throw upsertError;
-          
-          setSettings({
-            id: user.id,
-            dark_mode: null,
-            categories: defaultCategories
-          })
-          setCategories(defaultCategories);
+        });
+        const data: UserSettings = response.data;
+        setSettings(data)
+        setColorModeSetting(data.dark_mode === null ? 'system' : data.dark_mode ? 'dark' : 'light')
+        if (data.categories) {
+          setCategories(data.categories);
         }
       } catch (error: any) {
         toast({
           title: 'Error fetching settings',
-          description: error.message,
+          description: error.response?.data?.detail || error.message,
           status: 'error',
           duration: 5000,
         })
@@ -182,22 +97,21 @@ const Settings = () => {
       setColorMode(newMode)
     }
 
-    // Save to database
+    // Save through the settings API; only dark_mode is sent
     try {
-      const { error } = await supabase
-        .from('om_user_settings')
-        .upsert({
-          id: user.id,
-          dark_mode: newMode === 'system' ? null : newMode === 'dark',
-          categories: categories,
-          updated_at: new Date().toISOString()
-        })
-
-      if (error) throw error;
+      const response = await axios.patch('/api/v1/settings', {
+        dark_mode: newMode === 'system' ? null : newMode === 'dark'
+      }, {
+        headers: {
+          Authorization: `Bearer ${session?.access_token}`
+        }
+      });
+      setSettings(response.data)
+      queryClient.setQueryData(['userSettings', user.id], response.data)
     } catch (error: any) {
       toast({
         title: 'Error saving settings',
-        description: error.message,
+        description: error.response?.data?.detail || error.message,
         status: 'error',
         duration: 5000,
       })
@@ -3,12 +3,18 @@
 Script to create PostgreSQL schema and tables for Otter Money migration
 """
 import os
+import sys
+import gzip
 import json
+import time
+import hashlib
 import bcrypt
-from datetime import datetime
-from sqlalchemy import create_engine, text, Column, String, DateTime, Boolean, Integer, Numeric, JSON, Text
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, text, Column, String, DateTime, Boolean, Integer, Numeric, JSON, Text, UniqueConstraint, Index, BigInteger
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import declarative_base, sessionmaker
 from dotenv import load_dotenv
+from api.jsonstream import JsonStream, iter_events
 
 # Load environment variables
 load_dotenv()
@@ -37,7 +43,11 @@ class User(Base):
 
 class UserSimplefinToken(Base):
     __tablename__ = 'user_simplefin_tokens'
-    __table_args__ = {'schema': 'ottermoney'}
+    __table_args__ = (
+        # Token lookups fetch every connection of a user
+        Index('ix_user_simplefin_tokens_user_id', 'user_id'),
+        {'schema': 'ottermoney'},
+    )
 
     id = Column(String, primary_key=True)
     user_id = Column(String, nullable=False)
@@ -46,7 +56,30 @@ class UserSimplefinToken(Base):
 
 class UserAccount(Base):
     __tablename__ = 'user_accounts'
-    __table_args__ = {'schema': 'ottermoney'}
+    __table_args__ = (
+        # Conflict target of every account upsert (on_conflict="user_id,sf_account_id")
+        UniqueConstraint('user_id', 'sf_account_id', name='uq_user_accounts_user_account'),
+        # Default /user_accounts read: visible accounts by name, answered from
+        # the index alone. The predicate matches the API's hidden filter exactly
+        Index('ix_user_accounts_visible', 'user_id', 'sf_account_name', 'sf_account_id',
+              postgresql_include=['sf_name', 'balance', 'sf_balance_date', 'category', 'display_name', 'source', 'hidden'],
+              postgresql_where=text('hidden IS NULL OR hidden = false')),
+        # Sorted/filtered /user_accounts reads: (user_id, column, sf_account_id)
+        # matches both the ORDER BY and the keyset cursor condition
+        Index('ix_user_accounts_user_name', 'user_id', 'sf_account_name', 'sf_account_id'),
+        Index('ix_user_accounts_user_display_name', 'user_id', 'display_name', 'sf_account_id'),
+        Index('ix_user_accounts_user_institution', 'user_id', 'sf_name', 'sf_account_id'),
+        Index('ix_user_accounts_user_balance', 'user_id', 'balance', 'sf_account_id'),
+        Index('ix_user_accounts_user_balance_date', 'user_id', 'sf_balance_date', 'sf_account_id'),
+        Index('ix_user_accounts_user_category', 'user_id', 'category', 'sf_account_id'),
+        Index('ix_user_accounts_user_source', 'user_id', 'source', 'sf_account_id'),
+        # Substring search (ILIKE '%q%') on names
+        Index('ix_user_accounts_name_trgm', 'sf_account_name', postgresql_using='gin',
+              postgresql_ops={'sf_account_name': 'gin_trgm_ops'}),
+        Index('ix_user_accounts_display_name_trgm', 'display_name', postgresql_using='gin',
+              postgresql_ops={'display_name': 'gin_trgm_ops'}),
+        {'schema': 'ottermoney'},
+    )
 
     id = Column(String, primary_key=True)
     user_id = Column(String, nullable=False)
@@ -54,13 +87,56 @@ class UserAccount(Base):
     sf_account_name = Column(String)
     sf_name = Column(String)
     balance = Column(Numeric(precision=10, scale=2))
-    sf_balance_date = Column(Integer)
+    # Epoch seconds as delivered by SimpleFIN; 64-bit so it survives 2038
+    sf_balance_date = Column(BigInteger)
     inserted_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped by a trigger on every update in Supabase; the replication watermark
+    updated_at = Column(DateTime, default=datetime.utcnow)
     source = Column(String)
     category = Column(String)
     display_name = Column(String)
     hidden = Column(Boolean, default=False)
 
+class UserTransaction(Base):
+    """
+    Range-partitioned by year of `posted` (see create_transaction_partitions).
+    Postgres requires the partition key in every unique constraint, so
+    `posted` is part of the primary key and of the upsert conflict target.
+    Pending transactions have posted = 0 and land in the default partition.
+    """
+    __tablename__ = 'user_transactions'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'sf_account_id', 'sf_transaction_id', 'posted',
+                         name='uq_user_transactions_user_account_tx'),
+        # Analytics reads a user's history in date order
+        Index('ix_user_transactions_user_posted', 'user_id', 'posted'),
+        # Export keyset pagination, all transactions and per account (OFX)
+        Index('ix_user_transactions_user_id', 'user_id', 'id'),
+        Index('ix_user_transactions_user_account_id', 'user_id', 'sf_account_id', 'id'),
+        {'schema': 'ottermoney', 'postgresql_partition_by': 'RANGE (posted)'},
+    )
+
+    id = Column(String, primary_key=True)
+    posted = Column(BigInteger, primary_key=True, default=0)
+    user_id = Column(String, nullable=False)
+    sf_account_id = Column(String, nullable=False)
+    sf_transaction_id = Column(String, nullable=False)
+    transacted_at = Column(BigInteger)
+    amount = Column(Numeric(precision=12, scale=2))
+    description = Column(Text)
+    payee = Column(String)
+    memo = Column(Text)
+    pending = Column(Boolean, default=False)
+    category = Column(String)
+    auto_category = Column(String)
+    transfer_id = Column(String)
+    is_transfer = Column(Boolean, default=False)
+    duplicate_of = Column(String)
+    # Looks like a repeat but may be a genuine repeated purchase; kept in analytics
+    duplicate_candidate_of = Column(String)
+    inserted_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class UserSetting(Base):
     __tablename__ = 'user_settings'
     __table_args__ = {'schema': 'ottermoney'}
@@ -69,9 +145,41 @@ class UserSetting(Base):
     dark_mode = Column(Boolean, default=False)
     categories = Column(JSON)
     sf_last_sync = Column(DateTime)
+    # Last time user_accounts was refreshed from SimpleFIN, by sync or in the background
+    sf_accounts_refreshed_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class SyncRun(Base):
+    """One SimpleFIN sync, recorded by the sync endpoint when it finishes"""
+    __tablename__ = 'sync_runs'
+    __table_args__ = (
+        # Per-user history, newest first
+        Index('ix_sync_runs_user_started', 'user_id', 'started_at'),
+        # Fleet percentiles over a time window
+        Index('ix_sync_runs_started', 'started_at'),
+        {'schema': 'ottermoney'},
+    )
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String, nullable=False)
+    trigger = Column(String)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Integer)
+    fetch_ms = Column(Integer)
+    db_ms = Column(Integer)
+    connection_count = Column(Integer)
+    failed_connections = Column(Integer)
+    account_count = Column(Integer)
+    transaction_count = Column(Integer)
+    bytes_received = Column(BigInteger)
+    outcome = Column(String, nullable=False)
+    error_class = Column(String)
+    error_message = Column(Text)
+    # Per connection: status, elapsed_ms, bytes, counts, institutions, error
+    connections = Column(JSON)
+
 def create_schema_and_tables():
     """Create the ottermoney schema and all tables"""
     print("Connecting to PostgreSQL...")
@@ -80,14 +188,119 @@ def create_schema_and_tables():
     print("Creating ottermoney schema...")
     with engine.connect() as conn:
         conn.execute(text("CREATE SCHEMA IF NOT EXISTS ottermoney"))
+        # Trigram indexes back the account name search
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         conn.commit()
 
     print("Creating tables...")
     Base.metadata.create_all(engine, checkfirst=True)
+    create_transaction_partitions(engine)
 
     print("Tables created successfully!")
     return engine
 
+# Yearly user_transactions partitions are created from this year onwards
+FIRST_PARTITION_YEAR = 2015
+
+def create_transaction_partitions(engine, first_year=FIRST_PARTITION_YEAR, years_ahead=1):
+    """
+    Create one user_transactions partition per calendar year of `posted`
+    (epoch seconds), up to `years_ahead` years past the current one, plus a
+    default partition for pending (posted = 0) and out-of-range rows.
+    Safe to rerun; run it yearly to add upcoming partitions.
+    """
+    last_year = datetime.utcnow().year + years_ahead
+    with engine.begin() as conn:
+        for year in range(first_year, last_year + 1):
+            start = int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp())
+            end = int(datetime(year + 1, 1, 1, tzinfo=timezone.utc).timestamp())
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS ottermoney.user_transactions_{year} "
+                f"PARTITION OF ottermoney.user_transactions FOR VALUES FROM ({start}) TO ({end})"
+            ))
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS ottermoney.user_transactions_default "
+            "PARTITION OF ottermoney.user_transactions DEFAULT"
+        ))
+    print(f"Transaction partitions ready for {first_year}-{last_year}")
+
+# Hot API queries, with the index each one must be able to use
+HOT_QUERIES = {
+    "user_accounts visible list": (
+        "SELECT sf_account_id, sf_account_name, sf_name, balance, sf_balance_date, category, display_name, source, hidden "
+        "FROM ottermoney.user_accounts WHERE user_id = :user_id AND (hidden IS NULL OR hidden = false) "
+        "ORDER BY sf_account_name, sf_account_id"
+    ),
+    "user_accounts sorted by balance": (
+        "SELECT * FROM ottermoney.user_accounts WHERE user_id = :user_id ORDER BY balance DESC, sf_account_id LIMIT 50"
+    ),
+    "user_accounts name search": (
+        "SELECT * FROM ottermoney.user_accounts WHERE user_id = :user_id AND sf_account_name ILIKE '%chk%'"
+    ),
+    "user_accounts upsert conflict": (
+        "SELECT 1 FROM ottermoney.user_accounts WHERE user_id = :user_id AND sf_account_id = 'acct'"
+    ),
+    "simplefin token lookup": (
+        "SELECT id, simplefin_token FROM ottermoney.user_simplefin_tokens WHERE user_id = :user_id"
+    ),
+    "user settings": (
+        "SELECT * FROM ottermoney.user_settings WHERE id = :user_id"
+    ),
+    "analytics history": (
+        "SELECT posted, amount, category, auto_category FROM ottermoney.user_transactions "
+        "WHERE user_id = :user_id AND (is_transfer IS NULL OR is_transfer = false) AND duplicate_of IS NULL ORDER BY posted"
+    ),
+    "transactions export page": (
+        "SELECT * FROM ottermoney.user_transactions WHERE user_id = :user_id AND id > '' ORDER BY id LIMIT 1000"
+    ),
+    "sync run history": (
+        "SELECT * FROM ottermoney.sync_runs WHERE user_id = :user_id ORDER BY started_at DESC LIMIT 50"
+    ),
+    "sync runs window": (
+        "SELECT duration_ms, fetch_ms, db_ms FROM ottermoney.sync_runs WHERE started_at >= now() - interval '7 days'"
+    ),
+    "transactions upsert conflict": (
+        "SELECT 1 FROM ottermoney.user_transactions "
+        "WHERE user_id = :user_id AND sf_account_id = 'acct' AND sf_transaction_id = 'tx' AND posted = 0"
+    ),
+}
+
+def _sequential_scans(plan):
+    """Relations read by a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_sequential_scans(child))
+    return found
+
+def check_query_plans(engine, user_id="00000000-0000-0000-0000-000000000000"):
+    """
+    EXPLAIN every hot query and fail if any still needs a sequential scan.
+
+    Sequential scans are disabled for the check, so on a small development
+    database the planner still reports whether a usable index exists,
+    instead of preferring a scan because the table is tiny.
+    """
+    failures = []
+    with engine.connect() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, sql in HOT_QUERIES.items():
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), {"user_id": user_id}).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scans = _sequential_scans(plan[0]["Plan"])
+            status = "OK " if not scans else "SEQ"
+            print(f"  [{status}] {name}" + (f" (seq scan on {', '.join(scans)})" if scans else ""))
+            if scans:
+                failures.append(name)
+        conn.rollback()
+    if failures:
+        print(f"{len(failures)} hot queries are not index-backed")
+    else:
+        print("All hot queries use an index")
+    return not failures
+
 def create_initial_user(engine):
     """Create the initial user account"""
     print("Creating initial user account...")
@@ -123,78 +336,276 @@ def create_initial_user(engine):
     finally:
         session.close()
 
-def import_supabase_data(engine, json_file):
-    """Import data from the Supabase export"""
-    print(f"Importing data from {json_file}...")
+def _parse_timestamp(value):
+    """Parse a Supabase ISO timestamp, tolerating missing values"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _token_row(record):
+    return {
+        'id': record['id'],
+        'user_id': record['user_id'],
+        'simplefin_token': record['simplefin_token'],
+        'created_at': _parse_timestamp(record.get('created_at')),
+    }
+
+def _account_row(record):
+    return {
+        'id': record['id'],
+        'user_id': record['user_id'],
+        'sf_account_id': record['sf_account_id'],
+        'sf_account_name': record.get('sf_account_name'),
+        'sf_name': record.get('sf_name'),
+        'balance': record.get('balance'),
+        'sf_balance_date': record.get('sf_balance_date'),
+        'inserted_at': _parse_timestamp(record.get('inserted_at')),
+        'updated_at': _parse_timestamp(record.get('updated_at') or record.get('inserted_at')),
+        'source': record.get('source'),
+        'category': record.get('category'),
+        'display_name': record.get('display_name'),
+        'hidden': record.get('hidden'),
+    }
+
+def _setting_row(record):
+    return {
+        'id': record['id'],
+        'dark_mode': record.get('dark_mode'),
+        'categories': record.get('categories'),
+        'sf_last_sync': _parse_timestamp(record.get('sf_last_sync')),
+        'sf_accounts_refreshed_at': _parse_timestamp(record.get('sf_accounts_refreshed_at')),
+        'created_at': _parse_timestamp(record.get('created_at')),
+        'updated_at': _parse_timestamp(record.get('updated_at')),
+    }
+
+def _transaction_row(record):
+    return {
+        'id': record['id'],
+        'user_id': record['user_id'],
+        'sf_account_id': record['sf_account_id'],
+        'sf_transaction_id': record['sf_transaction_id'],
+        'posted': record.get('posted') or 0,
+        'transacted_at': record.get('transacted_at'),
+        'amount': record.get('amount'),
+        'description': record.get('description'),
+        'payee': record.get('payee'),
+        'memo': record.get('memo'),
+        'pending': record.get('pending'),
+        'category': record.get('category'),
+        'auto_category': record.get('auto_category'),
+        'transfer_id': record.get('transfer_id'),
+        'is_transfer': record.get('is_transfer'),
+        'duplicate_of': record.get('duplicate_of'),
+        'duplicate_candidate_of': record.get('duplicate_candidate_of'),
+        'inserted_at': _parse_timestamp(record.get('inserted_at')),
+        'updated_at': _parse_timestamp(record.get('updated_at')),
+    }
+
+def _sync_run_row(record):
+    return {
+        'id': record['id'],
+        'user_id': record['user_id'],
+        'trigger': record.get('trigger'),
+        'started_at': _parse_timestamp(record.get('started_at')),
+        'finished_at': _parse_timestamp(record.get('finished_at')),
+        'duration_ms': record.get('duration_ms'),
+        'fetch_ms': record.get('fetch_ms'),
+        'db_ms': record.get('db_ms'),
+        'connection_count': record.get('connection_count'),
+        'failed_connections': record.get('failed_connections'),
+        'account_count': record.get('account_count'),
+        'transaction_count': record.get('transaction_count'),
+        'bytes_received': record.get('bytes_received'),
+        'outcome': record['outcome'],
+        'error_class': record.get('error_class'),
+        'error_message': record.get('error_message'),
+        'connections': record.get('connections'),
+    }
+
+# Export table name -> (model, row converter), in import order
+IMPORT_TABLES = {
+    'om_user_simplefin_tokens': (UserSimplefinToken, _token_row),
+    'om_user_accounts': (UserAccount, _account_row),
+    'om_user_settings': (UserSetting, _setting_row),
+    'om_user_transactions': (UserTransaction, _transaction_row),
+    'om_sync_runs': (SyncRun, _sync_run_row),
+}
+
+IMPORT_BATCH_SIZE = 5000
+STREAM_CHUNK_SIZE = 1 << 16
+
+def _export_table_parser(stream):
+    # Parser generator over a {"table": [record, ...], ...} export (see api/jsonstream.py)
+    yield from stream.expect('{')
+    if (yield from stream.empty('}')):
+        return
+    while True:
+        table_name = yield from stream.decode_value()
+        yield from stream.expect(':')
+        yield from stream.expect('[')
+        if not (yield from stream.empty(']')):
+            while True:
+                record = yield from stream.decode_value()
+                yield table_name, record
+                if (yield from stream.expect(',]')) == ']':
+                    break
+        if (yield from stream.expect(',}')) == '}':
+            return
+
+def iter_export_tables(json_file, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream-parse a Supabase export of the form {"table": [record, ...], ...}.
 
+    Yields (table_name, record) pairs one record at a time, so only a single
+    record and one read chunk are ever held in memory.
+    """
     with open(json_file, 'r') as f:
-        data = json.load(f)
+        stream = JsonStream(f"export {json_file}")
+        yield from iter_events(_export_table_parser(stream), lambda: f.read(chunk_size))
+
+def _iter_ndjson(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield line
+
+def verify_export_dir(export_dir):
+    """Check every table file against the row count and checksum in the manifest"""
+    with open(os.path.join(export_dir, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('errors'):
+        raise ValueError(f"Export {export_dir} is incomplete, extraction failed for: {', '.join(manifest['errors'])}")
+    for table_name, entry in manifest['tables'].items():
+        digest = hashlib.sha256()
+        rows = 0
+        for line in _iter_ndjson(os.path.join(export_dir, entry['file'])):
+            digest.update(line.encode('utf-8'))
+            rows += 1
+        if rows != entry['rows'] or digest.hexdigest() != entry['sha256']:
+            raise ValueError(f"Export file {entry['file']} does not match the manifest "
+                             f"({rows} rows, expected {entry['rows']})")
+    return manifest
+
+def iter_export_dir(export_dir):
+    """
+    Yield (table_name, record) pairs from a per-table NDJSON export directory
+    written by migration_extract_supabase.py, after verifying the manifest.
+    """
+    manifest = verify_export_dir(export_dir)
+    for table_name in IMPORT_TABLES:
+        entry = manifest['tables'].get(table_name)
+        if not entry:
+            continue
+        for line in _iter_ndjson(os.path.join(export_dir, entry['file'])):
+            yield table_name, json.loads(line)
+
+def _load_import_state(state_file):
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+def _save_import_state(state_file, state):
+    # Write-then-rename so a crash never leaves a truncated checkpoint
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+def _upsert_batch(engine, model, rows):
+    """Bulk upsert one batch in its own transaction"""
+    table = model.__table__
+    stmt = pg_insert(table)
+    update_cols = {c.name: stmt.excluded[c.name] for c in table.columns if not c.primary_key}
+    stmt = stmt.on_conflict_do_update(index_elements=[c.name for c in table.primary_key.columns], set_=update_cols)
+    with engine.begin() as conn:
+        # A list of parameter sets is sent as a single executemany
+        conn.execute(stmt, rows)
+
+def import_supabase_data(engine, json_file, batch_size=IMPORT_BATCH_SIZE, resume=True):
+    """
+    Import data from the Supabase export.
+
+    `json_file` is either a single JSON export or an NDJSON export directory
+    with a manifest. The export is stream-parsed and upserted in batches of `batch_size` rows,
+    each committed in its own transaction. The number of committed rows per
+    table is checkpointed next to the export, so a rerun after a failure
+    resumes from the last committed batch. Upserts are idempotent, so
+    replaying a partially applied batch is safe.
+    """
+    print(f"Importing data from {json_file}...")
 
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    state_file = f"{json_file}.import_state.json"
+    state = _load_import_state(state_file) if resume else {}
+    if state:
+        print(f"Resuming import from checkpoint {state_file}: {state}")
+
+    counts = {table_name: 0 for table_name in IMPORT_TABLES}
+    skipped = {table_name: 0 for table_name in IMPORT_TABLES}
+    batch = []
+    batch_table = None
+    started = time.monotonic()
+    total_rows = 0
+
+    def flush():
+        nonlocal batch, total_rows
+        if not batch:
+            return
+        model, _ = IMPORT_TABLES[batch_table]
+        _upsert_batch(engine, model, batch)
+        counts[batch_table] += len(batch)
+        total_rows += len(batch)
+        state[batch_table] = state.get(batch_table, 0) + len(batch)
+        _save_import_state(state_file, state)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        print(f"  {batch_table}: {state[batch_table]} rows committed "
+              f"({total_rows / elapsed:,.0f} rows/s)")
+        batch = []
 
     try:
-        # Import SimpleFIN tokens
-        print("Importing SimpleFIN tokens...")
-        for record in data['om_user_simplefin_tokens']:
-            token = UserSimplefinToken(
-                id=record['id'],
-                user_id=record['user_id'],
-                simplefin_token=record['simplefin_token'],
-                created_at=datetime.fromisoformat(record['created_at'].replace('Z', '+00:00'))
-            )
-            session.merge(token)
-
-        # Import user accounts
-        print("Importing user accounts...")
-        for record in data['om_user_accounts']:
-            account = UserAccount(
-                id=record['id'],
-                user_id=record['user_id'],
-                sf_account_id=record['sf_account_id'],
-                sf_account_name=record['sf_account_name'],
-                sf_name=record['sf_name'],
-                balance=record['balance'],
-                sf_balance_date=record['sf_balance_date'],
-                inserted_at=datetime.fromisoformat(record['inserted_at'].replace('Z', '+00:00')),
-                source=record['source'],
-                category=record['category'],
-                display_name=record['display_name'],
-                hidden=record['hidden']
-            )
-            session.merge(account)
-
-        # Import user settings
-        print("Importing user settings...")
-        for record in data['om_user_settings']:
-            settings = UserSetting(
-                id=record['id'],
-                dark_mode=record['dark_mode'],
-                categories=record['categories'],
-                sf_last_sync=datetime.fromisoformat(record['sf_last_sync'].replace('Z', '+00:00')),
-                created_at=datetime.fromisoformat(record['created_at'].replace('Z', '+00:00')),
-                updated_at=datetime.fromisoformat(record['updated_at'].replace('Z', '+00:00'))
-            )
-            session.merge(settings)
-
-        session.commit()
-        print("Data import completed successfully!")
-
-        # Print summary
-        print("\nImport Summary:")
-        print(f"  SimpleFIN tokens: {len(data['om_user_simplefin_tokens'])}")
-        print(f"  User accounts: {len(data['om_user_accounts'])}")
-        print(f"  User settings: {len(data['om_user_settings'])}")
-
+        records = iter_export_dir(json_file) if os.path.isdir(json_file) else iter_export_tables(json_file)
+        for table_name, record in records:
+            if table_name not in IMPORT_TABLES:
+                continue
+            if table_name != batch_table:
+                flush()
+                batch_table = table_name
+                print(f"Importing {table_name}...")
+            if skipped[table_name] < state.get(table_name, 0):
+                skipped[table_name] += 1
+                continue
+            _, to_row = IMPORT_TABLES[table_name]
+            batch.append(to_row(record))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
     except Exception as e:
         print(f"Error importing data: {str(e)}")
-        session.rollback()
+        print(f"Committed batches are checkpointed in {state_file}; rerun to resume.")
         raise
-    finally:
-        session.close()
+
+    # The import finished, so the next run should start from scratch
+    if os.path.exists(state_file):
+        os.remove(state_file)
+
+    elapsed = time.monotonic() - started
+    print("Data import completed successfully!")
+
+    # Print summary
+    print("\nImport Summary:")
+    print(f"  SimpleFIN tokens: {counts['om_user_simplefin_tokens']}")
+    print(f"  User accounts: {counts['om_user_accounts']}")
+    print(f"  User settings: {counts['om_user_settings']}")
+    print(f"  User transactions: {counts['om_user_transactions']}")
+    if any(skipped.values()):
+        print(f"  Skipped (already committed): {sum(skipped.values())}")
+    print(f"  Elapsed: {elapsed:.1f}s ({total_rows / max(elapsed, 1e-6):,.0f} rows/s)")
 
 if __name__ == "__main__":
+    if "--check-plans" in sys.argv:
+        sys.exit(0 if check_query_plans(create_engine(DATABASE_URL)) else 1)
     engine = create_schema_and_tables()
     create_initial_user(engine)
-    import_supabase_data(engine, "supabase_data_export_20250923_163304.json")
+    # Path to a JSON export or an NDJSON export directory
+    export_path = sys.argv[1] if len(sys.argv) > 1 else "supabase_data_export_20250923_163304.json"
+    import_supabase_data(engine, export_path)
     print("Migration completed successfully!")
\ No newline at end of file
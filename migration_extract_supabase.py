@@ -4,6 +4,9 @@ Script to extract all data from Supabase tables for migration to PostgreSQL
 """
 import os
 import json
+import gzip
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
@@ -15,46 +18,107 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-def extract_supabase_data():
-    """Extract all data from Supabase tables"""
-    print("Connecting to Supabase...")
+# Tables to extract
+TABLES = [
+    "om_user_simplefin_tokens",
+    "om_user_accounts",
+    "om_user_settings",
+    "om_user_transactions",
+    "om_sync_runs"
+]
+
+# Rows requested per range request. PostgREST caps every response at its
+# max-rows setting, which may be lower, so a short page does not mean the
+# end of the table; paging stops at the first empty page
+PAGE_SIZE = 1000
+
+MANIFEST_FILE = "manifest.json"
+
+def extract_table(table_name, export_dir, page_size=PAGE_SIZE):
+    """
+    Page through one table with range requests and stream the rows to
+    <export_dir>/<table_name>.ndjson.gz, one JSON object per line.
+
+    Returns the manifest entry for the table. The checksum is a SHA-256 over
+    the uncompressed NDJSON lines, so it does not depend on gzip metadata.
+    Raises if fewer rows were read than the exact count PostgREST reported
+    at the start.
+    """
+    # One client per worker thread; clients are not shared across threads
     supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    filename = f"{table_name}.ndjson.gz"
+    digest = hashlib.sha256()
+    rows = 0
+    start = 0
+    expected = None
+
+    with gzip.open(os.path.join(export_dir, filename), 'wt', encoding='utf-8') as f:
+        while True:
+            # A stable order is required for range pagination to be exhaustive
+            response = (
+                supabase.schema("public").table(table_name)
+                .select("*", count="exact" if expected is None else None)
+                .order("id")
+                .range(start, start + page_size - 1)
+                .execute()
+            )
+            if expected is None:
+                expected = response.count
+            page = response.data or []
+            if not page:
+                break
+            for record in page:
+                line = json.dumps(record, default=str, separators=(',', ':')) + "\n"
+                f.write(line)
+                digest.update(line.encode('utf-8'))
+            rows += len(page)
+            start += len(page)
+            print(f"  → {table_name}: {rows} records so far...")
 
-    # Tables to extract
-    tables = [
-        "om_user_simplefin_tokens",
-        "om_user_accounts",
-        "om_user_settings"
-    ]
-
-    extracted_data = {}
-
-    for table_name in tables:
-        print(f"Extracting data from {table_name}...")
-        try:
-            # Get all data from table
-            response = supabase.schema("public").table(table_name).select("*").execute()
-            extracted_data[table_name] = response.data
-            print(f"  → Extracted {len(response.data)} records from {table_name}")
-        except Exception as e:
-            print(f"  → Error extracting from {table_name}: {str(e)}")
-            extracted_data[table_name] = []
-
-    # Save extracted data to JSON file
+    if expected is not None and rows < expected:
+        raise RuntimeError(f"{table_name}: read {rows} rows but PostgREST reported {expected}")
+    return {"file": filename, "rows": rows, "expected_rows": expected, "sha256": digest.hexdigest()}
+
+def extract_supabase_data(max_workers=None):
+    """Extract all data from Supabase tables"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"supabase_data_export_{timestamp}.json"
+    export_dir = f"supabase_data_export_{timestamp}"
+    os.makedirs(export_dir, exist_ok=True)
+
+    print(f"Extracting {len(TABLES)} tables from Supabase in parallel...")
+    manifest = {"created_at": datetime.now().isoformat(), "tables": {}}
+    errors = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(TABLES)) as executor:
+        futures = {executor.submit(extract_table, table_name, export_dir): table_name for table_name in TABLES}
+        for future in as_completed(futures):
+            table_name = futures[future]
+            try:
+                manifest["tables"][table_name] = future.result()
+                print(f"  → Extracted {manifest['tables'][table_name]['rows']} records from {table_name}")
+            except Exception as e:
+                print(f"  → Error extracting from {table_name}: {str(e)}")
+                errors[table_name] = str(e)
+
+    if errors:
+        # Record the failures rather than pretending the table was empty
+        manifest["errors"] = errors
 
-    with open(filename, 'w') as f:
-        json.dump(extracted_data, f, indent=2, default=str)
+    with open(os.path.join(export_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
 
-    print(f"\nData extraction complete. Saved to: {filename}")
+    print(f"\nData extraction complete. Saved to: {export_dir}/")
 
     # Print summary
     print("\nExtraction Summary:")
-    for table_name, data in extracted_data.items():
-        print(f"  {table_name}: {len(data)} records")
+    for table_name in TABLES:
+        entry = manifest["tables"].get(table_name)
+        if entry:
+            print(f"  {table_name}: {entry['rows']} records (sha256 {entry['sha256'][:12]}…)")
+        else:
+            print(f"  {table_name}: FAILED")
 
-    return extracted_data, filename
+    return manifest, export_dir
 
 if __name__ == "__main__":
-    data, filename = extract_supabase_data()
\ No newline at end of file
+    manifest, export_dir = extract_supabase_data()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Script to continuously replicate changed rows from Supabase into the
+PostgreSQL ottermoney schema ahead of cutover.
+
+Each cycle copies the rows whose watermark column is at or after the last
+persisted watermark, less a safety margin, and upserts them into PostgreSQL, so the final cutover
+only has to copy the last few seconds of changes. Deletes leave nothing to
+copy, so the final pass also removes rows that no longer exist in Supabase.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, select, delete
+from supabase import create_client, Client
+from dotenv import load_dotenv
+
+from migration_create_schema import DATABASE_URL, IMPORT_TABLES, _parse_timestamp, _upsert_batch
+from migration_extract_supabase import PAGE_SIZE
+
+# Load environment variables
+load_dotenv()
+
+# Supabase configuration
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+# Table -> column whose value moves forward whenever the row changes.
+# om_user_accounts.updated_at is maintained by a trigger
+# (supabase/migrations/20261019000100_user_accounts_updated_at.sql)
+REPLICATION_TABLES = {
+    "om_user_simplefin_tokens": "created_at",
+    "om_user_accounts": "updated_at",
+    "om_user_settings": "updated_at",
+    "om_user_transactions": "updated_at",
+    # Written once, when the run finishes
+    "om_sync_runs": "finished_at",
+}
+# Timestamps come from now() at statement start, so a transaction that
+# commits late can land rows older than the watermark; every cycle re-reads
+# this far behind it
+WATERMARK_MARGIN = timedelta(minutes=5)
+# Ids deleted per statement during reconciliation
+DELETE_BATCH_SIZE = 1000
+
+STATE_FILE = "replication_state.json"
+
+def load_watermarks(state_file=STATE_FILE):
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_watermarks(watermarks, state_file=STATE_FILE):
+    # Write-then-rename so a crash never leaves a truncated watermark file
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp_file, state_file)
+
+def replicate_table(supabase, engine, table_name, column, watermark, page_size=PAGE_SIZE, margin=WATERMARK_MARGIN):
+    """
+    Copy rows of one table changed at or after `watermark` less `margin`
+    (None copies all).
+
+    The margin is re-read on every cycle so that rows committed after the
+    watermark was taken, but stamped earlier, are never missed; the upsert
+    is idempotent, so re-applying them is harmless. Each page is committed
+    before the next is read.
+
+    Returns (rows_copied, new_watermark).
+    """
+    model, to_row = IMPORT_TABLES[table_name]
+    copied = 0
+    newest = _parse_timestamp(watermark)
+    since = (newest - margin).isoformat() if newest else None
+    start = 0
+
+    while True:
+        query = supabase.schema("public").table(table_name).select("*")
+        if since:
+            query = query.gte(column, since)
+        response = query.order(column).order("id").range(start, start + page_size - 1).execute()
+        page = response.data or []
+        # PostgREST may return fewer rows than requested, so only an empty
+        # page marks the end
+        if not page:
+            break
+        _upsert_batch(engine, model, [to_row(record) for record in page])
+        copied += len(page)
+        for record in page:
+            changed_at = _parse_timestamp(record.get(column))
+            if changed_at and (newest is None or changed_at > newest):
+                newest = changed_at
+        start += len(page)
+
+    return copied, newest.isoformat() if newest else watermark
+
+def reconcile_deletes(supabase, engine, table_name, page_size=PAGE_SIZE):
+    """
+    Delete rows from PostgreSQL whose id no longer exists in Supabase.
+
+    Reads every id on both sides, so it is meant for the final pass, when
+    writes to Supabase have stopped. Returns the number of rows deleted.
+    """
+    model, _ = IMPORT_TABLES[table_name]
+    source_ids = set()
+    start = 0
+    while True:
+        response = (
+            supabase.schema("public").table(table_name)
+            .select("id")
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        page = response.data or []
+        if not page:
+            break
+        source_ids.update(record["id"] for record in page)
+        start += len(page)
+
+    with engine.begin() as conn:
+        stale = [row_id for row_id in conn.execute(select(model.id)).scalars() if row_id not in source_ids]
+        for i in range(0, len(stale), DELETE_BATCH_SIZE):
+            conn.execute(delete(model).where(model.id.in_(stale[i:i + DELETE_BATCH_SIZE])))
+    return len(stale)
+
+def _lag_seconds(watermark):
+    """Seconds between now and the newest change replicated so far"""
+    newest = _parse_timestamp(watermark)
+    if newest is None:
+        return None
+    if newest.tzinfo is None:
+        newest = newest.replace(tzinfo=timezone.utc)
+    return max((datetime.now(timezone.utc) - newest).total_seconds(), 0.0)
+
+def replicate_once(supabase, engine, watermarks, final=False):
+    """
+    Run one replication cycle over all tables and persist the watermarks.
+    The final cycle also deletes rows that were deleted in Supabase.
+    """
+    cycle_start = time.monotonic()
+    total = 0
+    for table_name, column in REPLICATION_TABLES.items():
+        copied, new_watermark = replicate_table(supabase, engine, table_name, column, watermarks.get(table_name))
+        if new_watermark:
+            watermarks[table_name] = new_watermark
+        save_watermarks(watermarks)
+        total += copied
+        lag = _lag_seconds(watermarks.get(table_name))
+        lag_text = f"{lag:.1f}s" if lag is not None else "n/a"
+        print(f"  {table_name}: {copied} rows copied, watermark {watermarks.get(table_name)}, lag {lag_text}")
+        if final:
+            deleted = reconcile_deletes(supabase, engine, table_name)
+            print(f"  {table_name}: {deleted} rows deleted")
+    print(f"Cycle copied {total} rows in {time.monotonic() - cycle_start:.2f}s")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally replicate Supabase tables into PostgreSQL")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between cycles")
+    parser.add_argument("--once", action="store_true", help="run a single cycle and exit")
+    parser.add_argument("--final", action="store_true",
+                        help="cutover pass: single cycle that also deletes rows removed from Supabase")
+    args = parser.parse_args()
+
+    print("Connecting to Supabase and PostgreSQL...")
+    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    engine = create_engine(DATABASE_URL)
+    watermarks = load_watermarks()
+
+    if args.once or args.final:
+        replicate_once(supabase, engine, watermarks, final=args.final)
+        return
+
+    print(f"Replicating every {args.interval:.0f}s, Ctrl+C to stop...")
+    try:
+        while True:
+            try:
+                replicate_once(supabase, engine, watermarks)
+            except Exception as e:
+                # Watermarks only advance after a commit, so the next cycle retries
+                print(f"Replication cycle failed: {str(e)}", file=sys.stderr)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("Replication stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Categorization Benchmark
+Times CompiledRules.categorize on synthetic transactions, so changes to
+api/categorization.py can be compared against a known baseline
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from categorization import compile_rules
+
+WORDS = ("coffee", "market", "fuel", "grill", "pharmacy", "books", "air", "hotel", "taxi", "cinema")
+
+def build_categories(rule_count, regex_share, seed=0):
+    """Synthetic categories holding rule_count rules, five per category"""
+    rng = random.Random(seed)
+    categories = []
+    for i in range(0, rule_count, 5):
+        rules = []
+        for k in range(i, min(i + 5, rule_count)):
+            word = f"{rng.choice(WORDS)}{k}"
+            if rng.random() < regex_share:
+                rules.append({"match": "regex", "pattern": f"^pos {word}\\b"})
+            else:
+                rules.append({"match": "payee", "pattern": word})
+        categories.append({"name": f"Category {i // 5}", "rules": rules})
+    return {"transaction_categories": categories}
+
+def build_transactions(count, rule_count, unique_payees, seed=0):
+    """Synthetic transactions; about a fifth of them match a rule"""
+    rng = random.Random(seed)
+    transactions = []
+    for n in range(count):
+        payee = f"{rng.choice(WORDS)}{rng.randrange(rule_count * 2)}"
+        suffix = f" #{n}" if unique_payees else ""
+        transactions.append({
+            "description": f"POS {payee}{suffix}",
+            "amount": f"{-rng.random() * 100:.2f}",
+            "sf_account_id": "ACT-1",
+        })
+    return transactions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transaction categorization")
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--rules", type=int, default=300)
+    parser.add_argument("--regex-share", type=float, default=0.0, help="fraction of rules that are regexes")
+    parser.add_argument("--repeats", type=int, default=3, help="best of this many runs is reported")
+    args = parser.parse_args()
+
+    rules = compile_rules(build_categories(args.rules, args.regex_share))
+    for unique_payees in (True, False):
+        transactions = build_transactions(args.transactions, args.rules, unique_payees)
+        timings = []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            categorized = rules.categorize(transactions)
+            timings.append(time.perf_counter() - started)
+        matched = sum(1 for category in categorized if category)
+        label = "unique descriptions" if unique_payees else "repeated descriptions"
+        print(f"{args.transactions} transactions, {args.rules} rules, {label}: "
+              f"{min(timings):.3f}s ({matched} categorized)")
+
+if __name__ == "__main__":
+    main()
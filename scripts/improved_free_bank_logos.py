@@ -5,6 +5,9 @@ Works with verified free sources for bank logos
 """
 
 import os
+import argparse
+import asyncio
+import httpx
 import requests
 import json
 import time
@@ -85,6 +88,11 @@ class ImprovedFreeBankLogoFetcher:
             'westpac.com.au': {'name': 'Westpac', 'country': 'AU', 'type': 'Australian Bank'},
         }
     
+    def load_domains(self, domains_file):
+        """Replace the built-in bank list with a JSON file of {domain: {name, country, type}}."""
+        with open(domains_file, 'r', encoding='utf-8') as f:
+            self.bank_domains = json.load(f)
+    
     def fetch_from_clearbit(self):
         """Fetch logos from Clearbit Logo API."""
         logger.info("Fetching logos from Clearbit...")
@@ -175,6 +183,28 @@ class ImprovedFreeBankLogoFetcher:
             
             self.banks_data.append(bank_data)
     
+    @staticmethod
+    def _extension_for(content_type):
+        """Determine file extension from content type."""
+        content_type = content_type.lower()
+        if 'svg' in content_type:
+            return '.svg'
+        elif 'png' in content_type:
+            return '.png'
+        elif 'jpeg' in content_type or 'jpg' in content_type:
+            return '.jpg'
+        elif 'gif' in content_type:
+            return '.gif'
+        elif 'ico' in content_type:
+            return '.ico'
+        return '.png'  # Default
+    
+    @staticmethod
+    def _logo_filename(bank_data, ext):
+        """Create standardized filename."""
+        safe_name = re.sub(r'[^\w\-]', '_', bank_data['bank_name'])
+        return f"{bank_data['source']}_{safe_name}_{bank_data['country']}{ext}"
+    
     def download_logo(self, bank_data):
         """Download a logo file."""
         if 'logo_url' not in bank_data:
@@ -184,24 +214,8 @@ class ImprovedFreeBankLogoFetcher:
             response = self.session.get(bank_data['logo_url'], timeout=30)
             response.raise_for_status()
             
-            # Determine file extension from content type or URL
-            content_type = response.headers.get('content-type', '').lower()
-            if 'svg' in content_type:
-                ext = '.svg'
-            elif 'png' in content_type:
-                ext = '.png'
-            elif 'jpeg' in content_type or 'jpg' in content_type:
-                ext = '.jpg'
-            elif 'gif' in content_type:
-                ext = '.gif'
-            elif 'ico' in content_type:
-                ext = '.ico'
-            else:
-                ext = '.png'  # Default
-            
-            # Create standardized filename
-            safe_name = re.sub(r'[^\w\-]', '_', bank_data['bank_name'])
-            filename = f"{bank_data['source']}_{safe_name}_{bank_data['country']}{ext}"
+            ext = self._extension_for(response.headers.get('content-type', ''))
+            filename = self._logo_filename(bank_data, ext)
             
             file_path = self.output_dir / filename
             
@@ -353,6 +367,181 @@ Generated on: {time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime())}
         logger.info(f"📂 Files saved to: {self.output_dir}")
         logger.info("="*50)
 
+class SourceRateLimiter:
+    """Space out requests to one source to at most `rate` per second."""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+    
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncBankLogoFetcher(ImprovedFreeBankLogoFetcher):
+    """
+    Fetch logos concurrently with per-source rate limits.
+    
+    Each domain is resolved with a single conditional GET per source
+    (Clearbit first, Icon Horse as fallback) instead of HEAD then GET.
+    ETag and Last-Modified values from earlier runs are kept in
+    logo_cache.json, so unchanged logos come back as 304 and are not
+    downloaded again.
+    """
+    
+    # Requests per second allowed against each source
+    SOURCE_RATES = {
+        'clearbit': 10,
+        'icon_horse': 10,
+    }
+    
+    SOURCE_URLS = [
+        ('clearbit', 'https://logo.clearbit.com/{domain}', 'png'),
+        ('icon_horse', 'https://icon.horse/icon/{domain}', 'ico/png'),
+    ]
+    
+    def __init__(self, output_dir="standardized_bank_logos", concurrency=20):
+        super().__init__(output_dir)
+        self.concurrency = concurrency
+        self.cache_file = self.output_dir / 'logo_cache.json'
+        self.cache = self._load_cache()
+        self.not_modified_count = 0
+        self.limiters = {}
+    
+    def _load_cache(self):
+        if self.cache_file.exists():
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+    
+    def _save_cache(self):
+        tmp_file = self.cache_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, indent=2)
+        os.replace(tmp_file, self.cache_file)
+    
+    async def _fetch_source(self, client, source, url, bank_data):
+        """
+        Conditionally GET one logo URL.
+        
+        Returns True when the logo is available locally afterwards, either
+        freshly downloaded or unchanged since the cached copy.
+        """
+        cached = self.cache.get(url)
+        headers = {}
+        if cached and Path(cached['local_file']).exists():
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        
+        await self.limiters[source].wait()
+        response = await client.get(url, headers=headers)
+        
+        if response.status_code == 304 and cached:
+            bank_data['local_file'] = cached['local_file']
+            bank_data['file_size'] = cached['file_size']
+            self.not_modified_count += 1
+            return True
+        if response.status_code != 200:
+            return False
+        
+        ext = self._extension_for(response.headers.get('content-type', ''))
+        file_path = self.output_dir / self._logo_filename(bank_data, ext)
+        # File writes are small; keep them off the event loop anyway
+        await asyncio.to_thread(file_path.write_bytes, response.content)
+        
+        bank_data['local_file'] = str(file_path)
+        bank_data['file_size'] = len(response.content)
+        self.cache[url] = {
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'local_file': str(file_path),
+            'file_size': len(response.content),
+        }
+        self.downloaded_count += 1
+        logger.info(f"📥 Downloaded: {file_path.name} ({len(response.content)} bytes)")
+        return True
+    
+    async def _fetch_domain(self, client, semaphore, domain, info):
+        async with semaphore:
+            for source, url_template, logo_format in self.SOURCE_URLS:
+                url = url_template.format(domain=domain)
+                bank_data = {
+                    'source': source,
+                    'domain': domain,
+                    'bank_name': info['name'],
+                    'country': info['country'],
+                    'type': info['type'],
+                    'logo_url': url,
+                    'logo_format': logo_format
+                }
+                try:
+                    if await self._fetch_source(client, source, url, bank_data):
+                        self.banks_data.append(bank_data)
+                        return
+                except Exception as e:
+                    logger.error(f"Error fetching {source} logo for {domain}: {e}")
+            logger.warning(f"✗ No logo found for {info['name']}")
+            self.failed_count += 1
+    
+    async def fetch_all(self):
+        """Resolve every domain concurrently, bounded by `concurrency`."""
+        # Created here so they bind to the running event loop
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.limiters = {source: SourceRateLimiter(rate) for source, rate in self.SOURCE_RATES.items()}
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(headers=dict(self.session.headers), timeout=30,
+                                     follow_redirects=True, limits=limits) as client:
+            await asyncio.gather(*(
+                self._fetch_domain(client, semaphore, domain, info)
+                for domain, info in self.bank_domains.items()
+            ))
+    
+    def run(self):
+        """Run the concurrent fetching process."""
+        start_time = time.time()
+        
+        logger.info(f"🚀 Starting async Bank Logo Collection ({len(self.bank_domains)} domains, "
+                    f"concurrency {self.concurrency})...")
+        
+        asyncio.run(self.fetch_all())
+        self.fetch_from_freebiesupply()
+        
+        self._save_cache()
+        self.create_bank_index()
+        self.create_usage_guide()
+        
+        duration = time.time() - start_time
+        logger.info("\n" + "="*50)
+        logger.info("🎉 COLLECTION COMPLETE!")
+        logger.info("="*50)
+        logger.info(f"📁 Total banks cataloged: {len(self.banks_data)}")
+        logger.info(f"💾 Logos downloaded: {self.downloaded_count}")
+        logger.info(f"♻️  Unchanged (cached): {self.not_modified_count}")
+        logger.info(f"❌ No logo found: {self.failed_count}")
+        logger.info(f"⏱️  Total time: {duration:.1f} seconds")
+        logger.info(f"📂 Files saved to: {self.output_dir}")
+        logger.info("="*50)
+
 if __name__ == "__main__":
-    fetcher = ImprovedFreeBankLogoFetcher()
+    parser = argparse.ArgumentParser(description="Fetch bank logos from free sources")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="fetch concurrently with conditional requests against the local cache")
+    parser.add_argument("--concurrency", type=int, default=20, help="maximum in-flight domains in async mode")
+    parser.add_argument("--domains", help="JSON file of {domain: {name, country, type}} to fetch instead of the built-in list")
+    args = parser.parse_args()
+    
+    if args.use_async:
+        fetcher = AsyncBankLogoFetcher(concurrency=args.concurrency)
+    else:
+        fetcher = ImprovedFreeBankLogoFetcher()
+    if args.domains:
+        fetcher.load_domains(args.domains)
     fetcher.run() 
\ No newline at end of file
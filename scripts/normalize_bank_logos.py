@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Bank Logo Normalizer
+Post-processes logos fetched by improved_free_bank_logos.py into
+fixed-size WebP files, dedupes them by content and packs sprite atlases
+"""
+
+import os
+import io
+import json
+import math
+import hashlib
+import argparse
+from pathlib import Path
+import logging
+
+from PIL import Image
+
+# SVG rasterization is optional; without it SVG logos are skipped
+try:
+    import cairosvg
+except ImportError:
+    cairosvg = None
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Square output sizes in pixels
+SIZES = (32, 64, 128)
+
+# Sizes that get a sprite atlas; larger logos are served individually
+SPRITE_SIZES = (32, 64)
+
+WEBP_QUALITY = 85
+
+class BankLogoNormalizer:
+    """Normalize, dedupe and atlas the logos listed in bank_index.json."""
+    
+    def __init__(self, logo_dir="standardized_bank_logos"):
+        self.logo_dir = Path(logo_dir)
+        self.index_file = self.logo_dir / 'bank_index.json'
+        self.output_dir = self.logo_dir / 'normalized'
+        self.output_dir.mkdir(exist_ok=True)
+        
+        # content hash -> {size: Image}
+        self.unique_logos = {}
+        self.duplicate_count = 0
+        self.skipped_count = 0
+    
+    def load_image(self, path):
+        """Open any fetched logo as an RGBA image, rasterizing SVG."""
+        if path.suffix.lower() == '.svg':
+            if cairosvg is None:
+                raise ValueError("cairosvg is not installed, cannot rasterize SVG")
+            png_bytes = cairosvg.svg2png(url=str(path), output_width=max(SIZES), output_height=max(SIZES))
+            return Image.open(io.BytesIO(png_bytes)).convert('RGBA')
+        
+        image = Image.open(path)
+        if image.format == 'ICO':
+            # Favicons hold several sizes; use the largest
+            image.size = max(image.ico.sizes())
+        return image.convert('RGBA')
+    
+    @staticmethod
+    def fit_square(image, size):
+        """Scale to fit a transparent size x size square, preserving aspect ratio."""
+        # Drop fully transparent borders so logos fill the tile consistently
+        bbox = image.getbbox()
+        if bbox:
+            image = image.crop(bbox)
+        scale = size / max(image.size)
+        resized = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.LANCZOS
+        )
+        canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        canvas.paste(resized, ((size - resized.width) // 2, (size - resized.height) // 2))
+        return canvas
+    
+    def normalize(self, bank_data):
+        """Normalize one logo; returns its content hash or None."""
+        try:
+            image = self.load_image(Path(bank_data['local_file']))
+        except Exception as e:
+            logger.warning(f"✗ Skipping {bank_data['bank_name']}: {e}")
+            self.skipped_count += 1
+            return None
+        
+        renditions = {size: self.fit_square(image, size) for size in SIZES}
+        # Hash the normalized pixels, so the same logo delivered by different
+        # sources, formats or sizes collapses to a single file
+        largest = renditions[max(SIZES)]
+        content_hash = hashlib.sha256(largest.tobytes()).hexdigest()[:16]
+        
+        if content_hash in self.unique_logos:
+            self.duplicate_count += 1
+            logger.info(f"♻️  Duplicate logo for {bank_data['bank_name']} ({content_hash})")
+        else:
+            self.unique_logos[content_hash] = renditions
+            for size, rendition in renditions.items():
+                rendition.save(self.output_dir / f"{content_hash}_{size}.webp", 'WEBP', quality=WEBP_QUALITY, method=6)
+        
+        bank_data['logo_hash'] = content_hash
+        bank_data['normalized'] = {
+            str(size): str(self.output_dir / f"{content_hash}_{size}.webp") for size in SIZES
+        }
+        return content_hash
+    
+    def build_sprites(self):
+        """Pack every unique logo into one grid atlas per sprite size."""
+        hashes = sorted(self.unique_logos)
+        if not hashes:
+            return {}
+        columns = math.ceil(math.sqrt(len(hashes)))
+        rows = math.ceil(len(hashes) / columns)
+        
+        sprites = {}
+        for size in SPRITE_SIZES:
+            atlas = Image.new('RGBA', (columns * size, rows * size), (0, 0, 0, 0))
+            icons = {}
+            for i, content_hash in enumerate(hashes):
+                x, y = (i % columns) * size, (i // columns) * size
+                atlas.paste(self.unique_logos[content_hash][size], (x, y))
+                icons[content_hash] = [x, y]
+            sprite_file = self.output_dir / f"sprite_{size}.webp"
+            atlas.save(sprite_file, 'WEBP', quality=WEBP_QUALITY, method=6)
+            sprites[str(size)] = {
+                'file': str(sprite_file),
+                'width': atlas.width,
+                'height': atlas.height,
+                'icons': icons,
+            }
+            logger.info(f"🧩 Sprite {sprite_file.name}: {len(icons)} icons, {os.path.getsize(sprite_file)} bytes")
+        return sprites
+    
+    def run(self):
+        """Normalize every downloaded logo and rewrite bank_index.json."""
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        
+        banks = [bank for bank in index['banks'] if bank.get('local_file')]
+        logger.info(f"🚀 Normalizing {len(banks)} logos...")
+        for bank_data in banks:
+            self.normalize(bank_data)
+        
+        index['sizes'] = list(SIZES)
+        index['unique_logos'] = len(self.unique_logos)
+        index['sprites'] = self.build_sprites()
+        
+        tmp_file = self.index_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+        
+        logger.info("="*50)
+        logger.info(f"📁 Logos processed: {len(banks)}")
+        logger.info(f"🖼️  Unique logos: {len(self.unique_logos)}")
+        logger.info(f"♻️  Duplicates collapsed: {self.duplicate_count}")
+        logger.info(f"❌ Skipped: {self.skipped_count}")
+        logger.info(f"📋 Bank index updated: {self.index_file}")
+        logger.info("="*50)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize fetched bank logos into WebP renditions and sprites")
+    parser.add_argument("--logo-dir", default="standardized_bank_logos", help="directory containing bank_index.json")
+    args = parser.parse_args()
+    
+    BankLogoNormalizer(args.logo_dir).run()
@@ -0,0 +1,25 @@
+-- Track when account rows change so replication can copy them by watermark.
+-- Balance refreshes update rows in place and never touch inserted_at.
+
+alter table public.om_user_accounts
+    add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists ix_om_user_accounts_updated_at
+    on public.om_user_accounts (updated_at, id);
+
+-- Shared by every om_* table with an updated_at column, so rows written
+-- without setting it (direct table writes, partial upserts) still move forward
+create or replace function public.om_touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists om_user_accounts_touch_updated_at on public.om_user_accounts;
+create trigger om_user_accounts_touch_updated_at
+    before update on public.om_user_accounts
+    for each row execute function public.om_touch_updated_at();
@@ -0,0 +1,92 @@
+-- Tables written by the API with the service role key. Row level security
+-- is enabled without policies, so clients cannot read them directly.
+
+create table if not exists public.om_user_transactions (
+    id uuid primary key default gen_random_uuid(),
+    user_id uuid not null references auth.users (id) on delete cascade,
+    sf_account_id text not null,
+    sf_transaction_id text not null,
+    -- Epoch seconds; 0 while the transaction is pending
+    posted bigint not null default 0,
+    transacted_at bigint,
+    amount numeric(12, 2) not null,
+    description text,
+    payee text,
+    memo text,
+    pending boolean not null default false,
+    -- Chosen by the user; never written by sync
+    category text,
+    -- Assigned by the user's categorization rules on every sync
+    auto_category text,
+    transfer_id text,
+    is_transfer boolean not null default false,
+    duplicate_of text,
+    inserted_at timestamptz not null default now(),
+    updated_at timestamptz not null default now(),
+    -- Conflict target of every transaction upsert (TRANSACTION_CONFLICT in
+    -- api/routers/sync.py). posted is included because the PostgreSQL
+    -- target is partitioned on it
+    constraint uq_om_user_transactions_user_account_tx
+        unique (user_id, sf_account_id, sf_transaction_id, posted)
+);
+
+-- Analytics reads a user's history in date order
+create index if not exists ix_om_user_transactions_user_posted
+    on public.om_user_transactions (user_id, posted);
+-- Export keyset pagination, all transactions and per account (OFX)
+create index if not exists ix_om_user_transactions_user_id
+    on public.om_user_transactions (user_id, id);
+create index if not exists ix_om_user_transactions_user_account_id
+    on public.om_user_transactions (user_id, sf_account_id, id);
+-- Replication watermark
+create index if not exists ix_om_user_transactions_updated_at
+    on public.om_user_transactions (updated_at, id);
+
+drop trigger if exists om_user_transactions_touch_updated_at on public.om_user_transactions;
+create trigger om_user_transactions_touch_updated_at
+    before update on public.om_user_transactions
+    for each row execute function public.om_touch_updated_at();
+
+alter table public.om_user_transactions enable row level security;
+
+create table if not exists public.om_sync_runs (
+    id uuid primary key,
+    user_id uuid not null references auth.users (id) on delete cascade,
+    trigger text,
+    started_at timestamptz not null,
+    finished_at timestamptz,
+    duration_ms integer,
+    fetch_ms integer,
+    db_ms integer,
+    connection_count integer,
+    failed_connections integer,
+    account_count integer,
+    transaction_count integer,
+    bytes_received bigint,
+    -- success, partial or failed
+    outcome text not null,
+    error_class text,
+    error_message text,
+    -- Per connection: status, elapsed_ms, bytes, counts, institutions, error
+    connections jsonb
+);
+
+-- Per-user history, newest first
+create index if not exists ix_om_sync_runs_user_started
+    on public.om_sync_runs (user_id, started_at);
+-- Fleet percentiles over a time window, and the replication watermark
+create index if not exists ix_om_sync_runs_started
+    on public.om_sync_runs (started_at);
+create index if not exists ix_om_sync_runs_finished
+    on public.om_sync_runs (finished_at, id);
+
+alter table public.om_sync_runs enable row level security;
+
+-- Last time om_user_accounts was refreshed from SimpleFIN, by sync or in the background
+alter table public.om_user_settings
+    add column if not exists sf_accounts_refreshed_at timestamptz;
+
+drop trigger if exists om_user_settings_touch_updated_at on public.om_user_settings;
+create trigger om_user_settings_touch_updated_at
+    before update on public.om_user_settings
+    for each row execute function public.om_touch_updated_at();
@@ -0,0 +1,5 @@
+-- Rows that look like a repeat of another but cannot be verified as one
+-- (see flag_duplicates in api/transfers.py). Unlike duplicate_of, they are
+-- kept in analytics.
+alter table public.om_user_transactions
+    add column if not exists duplicate_candidate_of text;